@@ -1,11 +1,19 @@
 import secrets
 import base64
+import binascii
+import hashlib
+import hmac
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
-from io import BytesIO
+from functools import lru_cache
+from itertools import repeat
+from typing import List
 
 import bcrypt
 import pyotp
-import qrcode
+import segno
 from flask import request
 
 from backend.config import get_config
@@ -13,13 +21,35 @@ from backend import database as db
 
 config = get_config()
 
+TOTP_INTERVAL = 30
+TOTP_DIGITS = 6
 
-def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt(rounds=config.BCRYPT_ROUNDS)
+def _hash_with_rounds(password: str, rounds: int) -> str:
+    salt = bcrypt.gensalt(rounds=rounds)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 
+def hash_password(password: str) -> str:
+    return _hash_with_rounds(password, config.BCRYPT_ROUNDS)
+
+
+def hash_passwords_bulk(passwords: List[str]) -> List[str]:
+    # For setup/migration scripts: fans hashing out across all cores.
+    # The web request path keeps using hash_password.
+    with ProcessPoolExecutor() as executor:
+        return list(executor.map(_hash_with_rounds, passwords, repeat(config.BCRYPT_ROUNDS)))
+
+
+def password_needs_rehash(password_hash: str) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt+hash>
+    try:
+        return int(password_hash.split('$')[2]) < config.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
 def verify_password(password: str, password_hash: str) -> bool:
+    # bcrypt releases the GIL, so concurrent gthread request threads already check in parallel
     try:
         return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
     except Exception:
@@ -41,43 +71,61 @@ def generate_totp_secret() -> str:
     return pyotp.random_base32()
 
 
+@lru_cache(maxsize=1024)
+def _totp_for(secret: str) -> pyotp.TOTP:
+    return pyotp.TOTP(secret)
+
+
+@lru_cache(maxsize=1024)
+def _decode_totp_secret(secret: str) -> bytes:
+    padding = '=' * (-len(secret) % 8)
+    return base64.b32decode(secret + padding, casefold=True)
+
+
+def _hotp(key: bytes, counter: int) -> bytes:
+    digest = hmac.new(key, struct.pack('>Q', counter), hashlib.sha1).digest()
+    offset = digest[-1] & 0x0F
+    value = struct.unpack('>I', digest[offset:offset + 4])[0] & 0x7FFFFFFF
+    return str(value % 10 ** TOTP_DIGITS).zfill(TOTP_DIGITS).encode('ascii')
+
+
 def verify_totp(secret: str, code: str) -> bool:
     if not secret or not code:
         return False
-    totp = pyotp.TOTP(secret)
-    return totp.verify(code, valid_window=1)
 
+    code = str(code)
+    if len(code) != TOTP_DIGITS or not (code.isascii() and code.isdigit()):
+        return False
 
-def get_totp_qr_code(secret: str, email: str) -> str:
-    totp = pyotp.TOTP(secret)
-    provisioning_uri = totp.provisioning_uri(email, issuer_name="TEG Finance Admin")
+    try:
+        key = _decode_totp_secret(secret)
+    except (binascii.Error, ValueError):
+        return False
 
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(provisioning_uri)
-    qr.make(fit=True)
+    # Accept the previous, current and next time step (valid_window=1)
+    counter = int(time.time()) // TOTP_INTERVAL
+    code = code.encode('ascii')
+    valid = False
+    for step in (counter - 1, counter, counter + 1):
+        valid |= hmac.compare_digest(_hotp(key, step), code)
+    return valid
 
-    img = qr.make_image(fill_color="black", back_color="white")
 
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
+@lru_cache(maxsize=256)
+def get_totp_qr_code(secret: str, email: str) -> str:
+    totp = _totp_for(secret)
+    provisioning_uri = totp.provisioning_uri(email, issuer_name="TEG Finance Admin")
 
-    img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    return f"data:image/png;base64,{img_base64}"
+    qr = segno.make(provisioning_uri, error='l', micro=False)
+    # The image is a small two-colour bitmap, so fast zlib settings lose next to nothing
+    return qr.png_data_uri(scale=10, border=4, compresslevel=1)
 
 
-def is_account_locked(user: dict) -> bool:
+def is_account_locked(user: dict, now: datetime = None) -> bool:
+    # locked_until is TIMESTAMPTZ, so psycopg2 returns an aware datetime
     if not user.get('locked_until'):
         return False
-    locked_until = user['locked_until']
-    if locked_until.tzinfo is None:
-        locked_until = locked_until.replace(tzinfo=timezone.utc)
-    return datetime.now(timezone.utc) < locked_until
+    return (now or datetime.now(timezone.utc)) < user['locked_until']
 
 
 def authenticate_user(username: str, password: str, ip_address: str, user_agent: str) -> dict:
@@ -86,8 +134,10 @@ def authenticate_user(username: str, password: str, ip_address: str, user_agent:
     if not user:
         return {'error': 'Invalid username or password'}
 
+    now = datetime.now(timezone.utc)
+
     # Check if account is locked
-    if is_account_locked(user):
+    if is_account_locked(user, now):
         return {'error': 'Account is temporarily locked. Please try again later.'}
 
     # Verify password
@@ -97,7 +147,7 @@ def authenticate_user(username: str, password: str, ip_address: str, user_agent:
         locked_until = None
 
         if attempts >= config.MAX_LOGIN_ATTEMPTS:
-            locked_until = datetime.now(timezone.utc) + config.LOCKOUT_DURATION
+            locked_until = now + config.LOCKOUT_DURATION
             db.update_user_login_attempts(user['id'], attempts, locked_until)
             return {'error': 'Account locked due to too many failed attempts.'}
 
@@ -105,6 +155,10 @@ def authenticate_user(username: str, password: str, ip_address: str, user_agent:
         remaining = config.MAX_LOGIN_ATTEMPTS - attempts
         return {'error': f'Invalid username or password. {remaining} attempts remaining.'}
 
+    # Upgrade hashes created with fewer rounds than currently configured
+    if password_needs_rehash(user['password_hash']):
+        db.update_user_password(user['id'], hash_password(password))
+
     # Check if 2FA is enabled
     if user['totp_enabled']:
         return {
@@ -144,8 +198,14 @@ def get_current_user():
     if not session:
         return None
 
-    # Update last activity
-    db.update_session_activity(session['id'])
+    # Update last activity, at most once per SESSION_ACTIVITY_INTERVAL. The row is the
+    # one held in the session cache, so refresh its timestamp too; otherwise cached hits
+    # keep comparing against the old value and repeat the UPDATE.
+    now = datetime.now(timezone.utc)
+    last_activity = session.get('last_activity')
+    if not last_activity or now - last_activity >= config.SESSION_ACTIVITY_INTERVAL:
+        db.update_session_activity(session['id'])
+        session['last_activity'] = now
 
     return session
 
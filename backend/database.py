@@ -1,18 +1,61 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
+from psycopg2.errors import UniqueViolation
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extras import RealDictCursor, execute_values
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
+from collections import defaultdict
 from contextlib import contextmanager
-from typing import Optional, List, Dict, Any
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Tuple
+import atexit
+import json
 import logging
+import queue
+import threading
 
 from backend.config import get_config
 
 logger = logging.getLogger(__name__)
 
+# Hot statements prepared once per pooled connection and run with EXECUTE
+PREPARED_STATEMENTS = {
+    'get_user_by_username': (
+        "SELECT * FROM users WHERE username = $1 AND is_active = TRUE"
+    ),
+    'get_session_by_token': (
+        """SELECT s.*, u.username, u.email, u.totp_enabled
+           FROM sessions s
+           JOIN users u ON s.user_id = u.id
+           WHERE s.session_token = $1
+           AND s.expires_at > CURRENT_TIMESTAMP
+           AND u.is_active = TRUE"""
+    ),
+    'update_session_activity': (
+        """UPDATE sessions SET last_activity = CURRENT_TIMESTAMP
+           WHERE id = $1
+           AND (last_activity IS NULL OR last_activity < CURRENT_TIMESTAMP - $2::interval)"""
+    ),
+    'get_published_page_by_slug': (
+        """SELECT p.*, i.filename as hero_image_filename
+           FROM pages p
+           LEFT JOIN images i ON p.hero_image_id = i.id
+           WHERE p.slug = $1 AND p.is_published = TRUE"""
+    ),
+}
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    statements_prepared = False
+
 
 class DatabaseManager:
     def __init__(self):
         self.config = get_config()
         self._connection_params = self._parse_database_url(self.config.DATABASE_URL)
+        self._pool = None
+        self._pool_lock = threading.Lock()
 
     def _parse_database_url(self, url: str) -> dict:
         from urllib.parse import urlparse
@@ -25,18 +68,55 @@ class DatabaseManager:
             'password': parsed.password,
         }
 
+    def _get_pool(self) -> ThreadedConnectionPool:
+        # Created lazily so each Gunicorn worker opens its own connections after fork
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(
+                        self.config.DB_POOL_MIN_CONNECTIONS,
+                        self.config.DB_POOL_MAX_CONNECTIONS,
+                        connection_factory=PooledConnection,
+                        **self._connection_params
+                    )
+        return self._pool
+
+    def _prepare_statements(self, conn: PooledConnection):
+        with conn.cursor() as cursor:
+            cursor.execute("DEALLOCATE ALL")
+            for name, query in PREPARED_STATEMENTS.items():
+                cursor.execute(f"PREPARE {name} AS {query}")
+        conn.commit()
+        conn.statements_prepared = True
+
     @contextmanager
     def get_connection(self):
+        pool = self._get_pool()
         conn = None
+        broken = False
         try:
-            conn = psycopg2.connect(**self._connection_params)
+            conn = pool.getconn()
+            if not conn.statements_prepared:
+                self._prepare_statements(conn)
             yield conn
+        except UniqueViolation:
+            raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            broken = True
+            logger.error(f"Database connection error: {e}")
+            raise
         except Exception as e:
             logger.error(f"Database connection error: {e}")
             raise
         finally:
             if conn:
-                conn.close()
+                pool.putconn(conn, close=broken or bool(conn.closed))
+
+    def close_all(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
 
     @contextmanager
     def get_cursor(self, commit: bool = False):
@@ -46,6 +126,10 @@ class DatabaseManager:
                 yield cursor
                 if commit:
                     conn.commit()
+            except UniqueViolation:
+                # Duplicate keys are an expected outcome the caller turns into a response
+                conn.rollback()
+                raise
             except Exception as e:
                 conn.rollback()
                 logger.error(f"Database query error: {e}")
@@ -58,35 +142,89 @@ class DatabaseManager:
             cursor.execute(query, params)
             return cursor.rowcount
 
+    # RealDictRow is a dict subclass, so rows are returned without copying
     def fetch_one(self, query: str, params: tuple = None) -> Optional[Dict[str, Any]]:
         with self.get_cursor() as cursor:
             cursor.execute(query, params)
-            result = cursor.fetchone()
-            return dict(result) if result else None
+            return cursor.fetchone()
 
     def fetch_all(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
         with self.get_cursor() as cursor:
             cursor.execute(query, params)
-            results = cursor.fetchall()
-            return [dict(row) for row in results]
+            return cursor.fetchall()
 
     def insert_returning(self, query: str, params: tuple = None) -> Optional[Dict[str, Any]]:
         with self.get_cursor(commit=True) as cursor:
             cursor.execute(query, params)
-            result = cursor.fetchone()
-            return dict(result) if result else None
+            return cursor.fetchone()
 
 
 # Singleton instance
 db = DatabaseManager()
+atexit.register(db.close_all)
+
+# Short-lived per-process caches for rows read on nearly every request.
+# Write helpers invalidate them locally; other workers catch up on TTL expiry.
+_cache_lock = threading.RLock()
+_session_cache = TTLCache(maxsize=1024, ttl=5)
+_navigation_cache = TTLCache(maxsize=1, ttl=60)
+_settings_cache = TTLCache(maxsize=2, ttl=60)
+_service_pages_cache = TTLCache(maxsize=1, ttl=60)
+_page_cache = TTLCache(maxsize=512, ttl=30)
+
+
+def _invalidate(cache: TTLCache, *key):
+    with _cache_lock:
+        if key:
+            cache.pop(hashkey(*key), None)
+        else:
+            cache.clear()
+
+
+def invalidate_page_cache():
+    # Slugs can change on update, so every cached page row is dropped
+    _invalidate(_page_cache)
+    _invalidate(_service_pages_cache)
+
+
+def invalidate_content_caches():
+    # Everything the public pages are rendered from
+    with _cache_lock:
+        for cache in (_navigation_cache, _settings_cache, _service_pages_cache, _page_cache):
+            cache.clear()
+
+
+# Columns that update_page / update_navigation_item may set
+PAGE_UPDATE_FIELDS = ('slug', 'title', 'meta_title', 'meta_description', 'content',
+                      'hero_image_id', 'is_published', 'is_service_page',
+                      'service_icon', 'service_order', 'language')
+NAVIGATION_UPDATE_FIELDS = ('label', 'url', 'page_id', 'parent_id', 'position',
+                            'is_visible', 'open_in_new_tab')
+
+
+@lru_cache(maxsize=128)
+def _build_update_sql(table: str, keys: tuple) -> str:
+    # table and keys only ever come from the constants above, never from input
+    fields = [f"{key} = %s" for key in keys]
+    return f"UPDATE {table} SET {', '.join(fields)} WHERE id = %s"
+
+
+@lru_cache(maxsize=128)
+def _build_page_update_sql(keys: tuple) -> str:
+    # Self-join against the pre-update row so the old title comes back in the same trip,
+    # and join images so the result has the same shape as get_page_by_id
+    fields = [f"{key} = %s" for key in keys]
+    fields.append("updated_by = %s")
+    return (f"WITH updated AS (UPDATE pages p SET {', '.join(fields)} FROM pages old "
+            "WHERE p.id = %s AND old.id = p.id "
+            "RETURNING p.*, old.title AS old_title) "
+            "SELECT u.*, i.filename as hero_image_filename "
+            "FROM updated u LEFT JOIN images i ON u.hero_image_id = i.id")
 
 
 # Helper functions for common operations
 def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
-    return db.fetch_one(
-        "SELECT * FROM users WHERE username = %s AND is_active = TRUE",
-        (username,)
-    )
+    return db.fetch_one("EXECUTE get_user_by_username(%s)", (username,))
 
 
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
@@ -138,6 +276,7 @@ def update_user_password(user_id: str, password_hash: str):
            WHERE id = %s""",
         (password_hash, user_id)
     )
+    _invalidate(_session_cache)
 
 
 def set_password_reset_token(user_id: str, token: str, expires):
@@ -154,6 +293,7 @@ def update_user_totp(user_id: str, secret: str, enabled: bool):
         "UPDATE users SET totp_secret = %s, totp_enabled = %s WHERE id = %s",
         (secret, enabled, user_id)
     )
+    _invalidate(_session_cache)
 
 
 # Session functions
@@ -167,31 +307,26 @@ def create_session(user_id: str, session_token: str, ip_address: str,
     )
 
 
+@cached(_session_cache, lock=_cache_lock)
 def get_session_by_token(token: str) -> Optional[Dict[str, Any]]:
-    return db.fetch_one(
-        """SELECT s.*, u.username, u.email, u.totp_enabled
-           FROM sessions s
-           JOIN users u ON s.user_id = u.id
-           WHERE s.session_token = %s
-           AND s.expires_at > CURRENT_TIMESTAMP
-           AND u.is_active = TRUE""",
-        (token,)
-    )
+    return db.fetch_one("EXECUTE get_session_by_token(%s)", (token,))
 
 
 def update_session_activity(session_id: str):
     db.execute(
-        "UPDATE sessions SET last_activity = CURRENT_TIMESTAMP WHERE id = %s",
-        (session_id,)
+        "EXECUTE update_session_activity(%s, %s)",
+        (session_id, db.config.SESSION_ACTIVITY_INTERVAL)
     )
 
 
 def delete_session(token: str):
     db.execute("DELETE FROM sessions WHERE session_token = %s", (token,))
+    _invalidate(_session_cache, token)
 
 
 def delete_user_sessions(user_id: str):
     db.execute("DELETE FROM sessions WHERE user_id = %s", (user_id,))
+    _invalidate(_session_cache)
 
 
 def clean_expired_sessions():
@@ -199,23 +334,29 @@ def clean_expired_sessions():
 
 
 # Page functions
-def get_all_pages(published_only: bool = False) -> List[Dict[str, Any]]:
+def get_all_pages(published_only: bool = False, limit: int = None, offset: int = 0) -> List[Dict[str, Any]]:
+    # A NULL limit returns every row
     if published_only:
         return db.fetch_all(
-            """SELECT p.*, i.filename as hero_image_filename
+            """SELECT p.*, i.filename as hero_image_filename, i.alt_text as hero_image_alt
                FROM pages p
                LEFT JOIN images i ON p.hero_image_id = i.id
                WHERE p.is_published = TRUE
-               ORDER BY p.is_service_page DESC, p.service_order, p.title"""
+               ORDER BY p.is_service_page DESC, p.service_order, p.title, p.id
+               LIMIT %s OFFSET %s""",
+            (limit, offset)
         )
     return db.fetch_all(
-        """SELECT p.*, i.filename as hero_image_filename
+        """SELECT p.*, i.filename as hero_image_filename, i.alt_text as hero_image_alt
            FROM pages p
            LEFT JOIN images i ON p.hero_image_id = i.id
-           ORDER BY p.is_service_page DESC, p.service_order, p.title"""
+           ORDER BY p.is_service_page DESC, p.service_order, p.title, p.id
+           LIMIT %s OFFSET %s""",
+        (limit, offset)
     )
 
 
+@cached(_service_pages_cache, lock=_cache_lock)
 def get_service_pages() -> List[Dict[str, Any]]:
     return db.fetch_all(
         """SELECT p.*, i.filename as hero_image_filename
@@ -226,16 +367,13 @@ def get_service_pages() -> List[Dict[str, Any]]:
     )
 
 
-def get_page_by_slug(slug: str) -> Optional[Dict[str, Any]]:
-    return db.fetch_one(
-        """SELECT p.*, i.filename as hero_image_filename
-           FROM pages p
-           LEFT JOIN images i ON p.hero_image_id = i.id
-           WHERE p.slug = %s""",
-        (slug,)
-    )
+@cached(_page_cache, key=lambda slug: hashkey('published', slug), lock=_cache_lock)
+def get_published_page_by_slug(slug: str) -> Optional[Dict[str, Any]]:
+    return db.fetch_one("EXECUTE get_published_page_by_slug(%s)", (slug,))
 
 
+# Admin reads go straight to the database: a row cached in another worker could be
+# stale and would be saved back over a newer edit
 def get_page_by_id(page_id: str) -> Optional[Dict[str, Any]]:
     return db.fetch_one(
         """SELECT p.*, i.filename as hero_image_filename
@@ -247,13 +385,20 @@ def get_page_by_id(page_id: str) -> Optional[Dict[str, Any]]:
 
 
 def create_page(data: Dict[str, Any], user_id: str) -> Optional[Dict[str, Any]]:
-    return db.insert_returning(
-        """INSERT INTO pages
-           (slug, title, meta_title, meta_description, content, hero_image_id,
-            is_published, is_service_page, service_icon, service_order, language,
-            created_by, updated_by)
-           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-           RETURNING *""",
+    # Returns None when the slug is already taken
+    page = db.insert_returning(
+        """WITH created AS (
+               INSERT INTO pages
+               (slug, title, meta_title, meta_description, content, hero_image_id,
+                is_published, is_service_page, service_icon, service_order, language,
+                created_by, updated_by)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+               ON CONFLICT (slug) DO NOTHING
+               RETURNING *
+           )
+           SELECT c.*, i.filename as hero_image_filename
+           FROM created c
+           LEFT JOIN images i ON c.hero_image_id = i.id""",
         (data['slug'], data['title'], data.get('meta_title'),
          data.get('meta_description'), data.get('content'),
          data.get('hero_image_id'), data.get('is_published', False),
@@ -261,46 +406,58 @@ def create_page(data: Dict[str, Any], user_id: str) -> Optional[Dict[str, Any]]:
          data.get('service_order', 0), data.get('language', 'en'),
          user_id, user_id)
     )
+    invalidate_page_cache()
+    return page
 
 
-def update_page(page_id: str, data: Dict[str, Any], user_id: str):
-    fields = []
-    values = []
-
-    for key in ['slug', 'title', 'meta_title', 'meta_description', 'content',
-                'hero_image_id', 'is_published', 'is_service_page',
-                'service_icon', 'service_order', 'language']:
-        if key in data:
-            fields.append(f"{key} = %s")
-            values.append(data[key])
-
-    if not fields:
-        return
+def update_page(page_id: str, data: Dict[str, Any], user_id: str) -> Optional[Dict[str, Any]]:
+    # Returns the updated row plus old_title, or None if the page doesn't exist.
+    # A slug already used by another page raises UniqueViolation.
+    keys = tuple(key for key in PAGE_UPDATE_FIELDS if key in data)
 
-    fields.append("updated_by = %s")
+    values = [data[key] for key in keys]
     values.append(user_id)
     values.append(page_id)
 
-    db.execute(
-        f"UPDATE pages SET {', '.join(fields)} WHERE id = %s",
-        tuple(values)
+    page = db.insert_returning(_build_page_update_sql(keys), tuple(values))
+    _invalidate(_navigation_cache)
+    invalidate_page_cache()
+    return page
+
+
+def toggle_page_publish(page_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    # Flips the flag in place; returns None if the page doesn't exist
+    page = db.insert_returning(
+        """UPDATE pages SET is_published = NOT is_published, updated_by = %s
+           WHERE id = %s RETURNING is_published""",
+        (user_id, page_id)
     )
+    _invalidate(_navigation_cache)
+    invalidate_page_cache()
+    return page
 
 
-def delete_page(page_id: str):
-    db.execute("DELETE FROM pages WHERE id = %s", (page_id,))
+def delete_page(page_id: str) -> Optional[Dict[str, Any]]:
+    page = db.insert_returning(
+        "DELETE FROM pages WHERE id = %s RETURNING title, slug",
+        (page_id,)
+    )
+    _invalidate(_navigation_cache)
+    invalidate_page_cache()
+    return page
 
 
 # Navigation functions
 def get_navigation_items() -> List[Dict[str, Any]]:
     return db.fetch_all(
-        """SELECT n.*, p.slug as page_slug
+        """SELECT n.*, p.slug as page_slug, p.title as page_title
            FROM navigation_items n
            LEFT JOIN pages p ON n.page_id = p.id
            ORDER BY n.position"""
     )
 
 
+@cached(_navigation_cache, lock=_cache_lock)
 def get_visible_navigation() -> List[Dict[str, Any]]:
     items = db.fetch_all(
         """SELECT n.*, p.slug as page_slug
@@ -310,27 +467,18 @@ def get_visible_navigation() -> List[Dict[str, Any]]:
            ORDER BY n.position"""
     )
 
-    # Build tree structure
-    root_items = []
-    children_map = {}
+    # Build tree structure in one pass; children lists are shared by reference
+    children = defaultdict(list)
 
     for item in items:
-        item['children'] = []
-        if item['parent_id']:
-            if item['parent_id'] not in children_map:
-                children_map[item['parent_id']] = []
-            children_map[item['parent_id']].append(item)
-        else:
-            root_items.append(item)
+        item['children'] = children[item['id']]
+        children[item['parent_id']].append(item)
 
-    for item in root_items:
-        item['children'] = children_map.get(item['id'], [])
-
-    return root_items
+    return children[None]
 
 
 def create_navigation_item(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    return db.insert_returning(
+    item = db.insert_returning(
         """INSERT INTO navigation_items (label, url, page_id, parent_id, position, is_visible, open_in_new_tab)
            VALUES (%s, %s, %s, %s, %s, %s, %s)
            RETURNING *""",
@@ -338,49 +486,52 @@ def create_navigation_item(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
          data.get('parent_id'), data.get('position', 0),
          data.get('is_visible', True), data.get('open_in_new_tab', False))
     )
+    _invalidate(_navigation_cache)
+    return item
 
 
 def update_navigation_item(item_id: str, data: Dict[str, Any]):
-    fields = []
-    values = []
-
-    for key in ['label', 'url', 'page_id', 'parent_id', 'position',
-                'is_visible', 'open_in_new_tab']:
-        if key in data:
-            fields.append(f"{key} = %s")
-            values.append(data[key])
-
-    if not fields:
+    keys = tuple(key for key in NAVIGATION_UPDATE_FIELDS if key in data)
+    if not keys:
         return
 
+    values = [data[key] for key in keys]
     values.append(item_id)
-    db.execute(
-        f"UPDATE navigation_items SET {', '.join(fields)} WHERE id = %s",
-        tuple(values)
-    )
+
+    db.execute(_build_update_sql('navigation_items', keys), tuple(values))
+    _invalidate(_navigation_cache)
 
 
 def delete_navigation_item(item_id: str):
     db.execute("DELETE FROM navigation_items WHERE id = %s", (item_id,))
+    _invalidate(_navigation_cache)
 
 
 def reorder_navigation_items(items: List[Dict[str, Any]]):
+    # One page covering every item keeps the whole reorder to a single statement
     with db.get_cursor(commit=True) as cursor:
-        for item in items:
-            cursor.execute(
-                "UPDATE navigation_items SET position = %s, parent_id = %s WHERE id = %s",
-                (item['position'], item.get('parent_id'), item['id'])
-            )
+        execute_values(
+            cursor,
+            """UPDATE navigation_items n
+               SET position = v.position::integer, parent_id = v.parent_id::uuid
+               FROM (VALUES %s) AS v(position, parent_id, id)
+               WHERE n.id = v.id::uuid""",
+            [(item['position'], item.get('parent_id'), item['id']) for item in items],
+            page_size=max(len(items), 1)
+        )
+    _invalidate(_navigation_cache)
 
 
 # Image functions
-def get_all_images() -> List[Dict[str, Any]]:
-    return db.fetch_all(
-        """SELECT i.*, u.username as uploaded_by_name
-           FROM images i
-           LEFT JOIN users u ON i.uploaded_by = u.id
-           ORDER BY i.created_at DESC"""
-    )
+ALL_IMAGES_QUERY = """SELECT i.*, u.username as uploaded_by_name
+                      FROM images i
+                      LEFT JOIN users u ON i.uploaded_by = u.id
+                      ORDER BY i.created_at DESC, i.id
+                      LIMIT %s OFFSET %s"""
+
+
+def get_all_images(limit: int = None, offset: int = 0) -> List[Dict[str, Any]]:
+    return db.fetch_all(ALL_IMAGES_QUERY, (limit, offset))
 
 
 def get_image_by_id(image_id: str) -> Optional[Dict[str, Any]]:
@@ -409,9 +560,11 @@ def update_image(image_id: str, data: Dict[str, Any]):
 
 def delete_image(image_id: str):
     db.execute("DELETE FROM images WHERE id = %s", (image_id,))
+    invalidate_page_cache()
 
 
 # Settings functions
+@cached(_settings_cache, lock=_cache_lock)
 def get_all_settings(public_only: bool = False) -> Dict[str, Any]:
     if public_only:
         rows = db.fetch_all(
@@ -432,25 +585,24 @@ def get_setting(key: str) -> Optional[str]:
 
 
 def update_setting(key: str, value: str, user_id: str = None):
-    db.execute(
-        """INSERT INTO site_settings (setting_key, setting_value, updated_by)
-           VALUES (%s, %s, %s)
-           ON CONFLICT (setting_key)
-           DO UPDATE SET setting_value = %s, updated_by = %s""",
-        (key, value, user_id, value, user_id)
-    )
+    update_settings({key: value}, user_id)
 
 
 def update_settings(settings: Dict[str, str], user_id: str = None):
+    # Every key is upserted in one statement, however many are saved
+    if not settings:
+        return
     with db.get_cursor(commit=True) as cursor:
-        for key, value in settings.items():
-            cursor.execute(
-                """INSERT INTO site_settings (setting_key, setting_value, updated_by)
-                   VALUES (%s, %s, %s)
-                   ON CONFLICT (setting_key)
-                   DO UPDATE SET setting_value = %s, updated_by = %s""",
-                (key, value, user_id, value, user_id)
-            )
+        execute_values(
+            cursor,
+            """INSERT INTO site_settings (setting_key, setting_value, updated_by)
+               VALUES %s
+               ON CONFLICT (setting_key)
+               DO UPDATE SET setting_value = EXCLUDED.setting_value,
+                             updated_by = EXCLUDED.updated_by""",
+            [(key, value, user_id) for key, value in settings.items()]
+        )
+    _invalidate(_settings_cache)
 
 
 # Email config functions
@@ -459,46 +611,38 @@ def get_email_config() -> Optional[Dict[str, Any]]:
 
 
 def update_email_config(data: Dict[str, Any], user_id: str = None):
-    existing = get_email_config()
-
-    if existing:
-        db.execute(
-            """UPDATE email_config SET
-               smtp_host = %s, smtp_port = %s, use_tls = %s,
-               smtp_username = %s, smtp_password = %s,
-               from_email = %s, from_name = %s, recipient_email = %s,
-               is_configured = %s, updated_by = %s
-               WHERE id = %s""",
-            (data.get('smtp_host', 'smtp.gmail.com'),
-             data.get('smtp_port', 587),
-             data.get('use_tls', True),
-             data.get('smtp_username'),
-             data.get('smtp_password'),
-             data.get('from_email'),
-             data.get('from_name', 'TEG Finance'),
-             data.get('recipient_email'),
-             data.get('is_configured', False),
-             user_id,
-             existing['id'])
-        )
-    else:
-        db.insert_returning(
-            """INSERT INTO email_config
-               (smtp_host, smtp_port, use_tls, smtp_username, smtp_password,
-                from_email, from_name, recipient_email, is_configured, updated_by)
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-               RETURNING *""",
-            (data.get('smtp_host', 'smtp.gmail.com'),
-             data.get('smtp_port', 587),
-             data.get('use_tls', True),
-             data.get('smtp_username'),
-             data.get('smtp_password'),
-             data.get('from_email'),
-             data.get('from_name', 'TEG Finance'),
-             data.get('recipient_email'),
-             data.get('is_configured', False),
-             user_id)
-        )
+    # email_config holds a single row: update it if present, otherwise insert it
+    db.execute(
+        """WITH updated AS (
+               UPDATE email_config SET
+               smtp_host = %(smtp_host)s, smtp_port = %(smtp_port)s, use_tls = %(use_tls)s,
+               smtp_username = %(smtp_username)s, smtp_password = %(smtp_password)s,
+               from_email = %(from_email)s, from_name = %(from_name)s,
+               recipient_email = %(recipient_email)s,
+               is_configured = %(is_configured)s, updated_by = %(updated_by)s
+               WHERE id = (SELECT id FROM email_config LIMIT 1)
+               RETURNING id
+           )
+           INSERT INTO email_config
+           (smtp_host, smtp_port, use_tls, smtp_username, smtp_password,
+            from_email, from_name, recipient_email, is_configured, updated_by)
+           SELECT %(smtp_host)s, %(smtp_port)s, %(use_tls)s, %(smtp_username)s,
+                  %(smtp_password)s, %(from_email)s, %(from_name)s,
+                  %(recipient_email)s, %(is_configured)s, %(updated_by)s::uuid
+           WHERE NOT EXISTS (SELECT 1 FROM updated)""",
+        {
+            'smtp_host': data.get('smtp_host', 'smtp.gmail.com'),
+            'smtp_port': data.get('smtp_port', 587),
+            'use_tls': data.get('use_tls', True),
+            'smtp_username': data.get('smtp_username'),
+            'smtp_password': data.get('smtp_password'),
+            'from_email': data.get('from_email'),
+            'from_name': data.get('from_name', 'TEG Finance'),
+            'recipient_email': data.get('recipient_email'),
+            'is_configured': data.get('is_configured', False),
+            'updated_by': user_id,
+        }
+    )
 
 
 # Contact submissions functions
@@ -507,13 +651,13 @@ def get_contact_submissions(unread_only: bool = False, limit: int = 50, offset:
         return db.fetch_all(
             """SELECT * FROM contact_submissions
                WHERE is_read = FALSE
-               ORDER BY created_at DESC
+               ORDER BY created_at DESC, id
                LIMIT %s OFFSET %s""",
             (limit, offset)
         )
     return db.fetch_all(
         """SELECT * FROM contact_submissions
-           ORDER BY created_at DESC
+           ORDER BY created_at DESC, id
            LIMIT %s OFFSET %s""",
         (limit, offset)
     )
@@ -556,62 +700,176 @@ def delete_contact_submission(submission_id: str):
     db.execute("DELETE FROM contact_submissions WHERE id = %s", (submission_id,))
 
 
-def get_submission_stats() -> Dict[str, int]:
-    result = db.fetch_one(
-        """SELECT
-           COUNT(*) as total,
-           COUNT(*) FILTER (WHERE is_read = FALSE) as unread,
-           COUNT(*) FILTER (WHERE created_at > CURRENT_DATE - INTERVAL '7 days') as this_week
-           FROM contact_submissions"""
+SUBMISSION_STAT_COLUMNS = (('stats_total', 'total'), ('stats_unread', 'unread'),
+                           ('stats_this_week', 'this_week'))
+
+
+def get_contact_submissions_with_stats(unread_only: bool = False, limit: int = 50,
+                                       offset: int = 0) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    # The stats row is LEFT JOINed to the page so an empty page still returns the counts
+    rows = db.fetch_all(
+        """WITH stats AS (
+               SELECT COUNT(*) as stats_total,
+                      COUNT(*) FILTER (WHERE is_read = FALSE) as stats_unread,
+                      COUNT(*) FILTER (WHERE created_at > CURRENT_DATE - INTERVAL '7 days') as stats_this_week
+               FROM contact_submissions
+           ), page AS (
+               SELECT * FROM contact_submissions
+               WHERE %s = FALSE OR is_read = FALSE
+               ORDER BY created_at DESC, id
+               LIMIT %s OFFSET %s
+           )
+           SELECT page.*, stats.*
+           FROM stats LEFT JOIN page ON TRUE
+           ORDER BY page.created_at DESC, page.id""",
+        (unread_only, limit, offset)
     )
-    return result if result else {'total': 0, 'unread': 0, 'this_week': 0}
+
+    stats = {name: rows[0][column] for column, name in SUBMISSION_STAT_COLUMNS}
+    for row in rows:
+        for column, _ in SUBMISSION_STAT_COLUMNS:
+            del row[column]
+
+    return [row for row in rows if row['id'] is not None], stats
 
 
 # Audit log functions
+def _audit_json(values) -> Optional[str]:
+    return json.dumps(values, separators=(',', ':')) if values else None
+
+
+# Audit entries are queued and written in batches by a background thread so
+# request handlers don't wait on the INSERT. At exit the thread is stopped and joined.
+AUDIT_BATCH_SIZE = 128
+AUDIT_BATCH_WAIT = 0.25
+AUDIT_SHUTDOWN_TIMEOUT = 10
+AUDIT_IP_MAX_LENGTH = 45  # audit_log.ip_address is VARCHAR(45)
+
+_audit_queue = queue.Queue()
+_audit_thread = None
+_audit_thread_lock = threading.Lock()
+_AUDIT_STOP = object()
+
+
+def _audit_row(entry: tuple) -> tuple:
+    user_id, action, entity_type, entity_id, old_values, new_values, ip_address, user_agent = entry
+    return (user_id, action, entity_type, entity_id,
+            _audit_json(old_values), _audit_json(new_values),
+            ip_address[:AUDIT_IP_MAX_LENGTH] if ip_address else ip_address, user_agent)
+
+
+def _insert_audit_rows(rows: List[tuple]):
+    with db.get_cursor(commit=True) as cursor:
+        execute_values(
+            cursor,
+            """INSERT INTO audit_log
+               (user_id, action, entity_type, entity_id, old_values, new_values, ip_address, user_agent)
+               VALUES %s""",
+            rows,
+            page_size=len(rows)
+        )
+
+
+def _write_audit_batch(rows: List[tuple]):
+    try:
+        _insert_audit_rows(rows)
+    except Exception as e:
+        if len(rows) == 1:
+            logger.error(f"Failed to write audit log entry '{rows[0][1]}': {e}")
+            return
+        # One bad row fails the whole INSERT, so retry them singly and lose only that row
+        logger.warning(f"Audit batch of {len(rows)} failed, retrying entries individually: {e}")
+        for row in rows:
+            _write_audit_batch([row])
+
+
+def _audit_flusher():
+    while True:
+        batch = [_audit_queue.get()]
+        while len(batch) < AUDIT_BATCH_SIZE and batch[-1] is not _AUDIT_STOP:
+            try:
+                batch.append(_audit_queue.get(timeout=AUDIT_BATCH_WAIT))
+            except queue.Empty:
+                break
+        stopping = batch[-1] is _AUDIT_STOP
+        if stopping:
+            batch.pop()
+        if batch:
+            _write_audit_batch(batch)
+        if stopping:
+            return
+
+
+def _ensure_audit_flusher():
+    # Started lazily so each Gunicorn worker runs its own thread after fork
+    global _audit_thread
+    if _audit_thread is None:
+        with _audit_thread_lock:
+            if _audit_thread is None:
+                _audit_thread = threading.Thread(target=_audit_flusher, name='audit-flusher', daemon=True)
+                _audit_thread.start()
+
+
+@atexit.register
+def flush_audit_logs():
+    # atexit runs handlers in reverse, so this finishes before db.close_all closes the pool.
+    # The flusher writes whatever batch it holds before exiting; the rest is drained here.
+    if _audit_thread is not None and _audit_thread.is_alive():
+        _audit_queue.put(_AUDIT_STOP)
+        _audit_thread.join(timeout=AUDIT_SHUTDOWN_TIMEOUT)
+
+    rows = []
+    while True:
+        try:
+            entry = _audit_queue.get_nowait()
+        except queue.Empty:
+            break
+        if entry is not _AUDIT_STOP:
+            rows.append(entry)
+    if rows:
+        _write_audit_batch(rows)
+
+
 def create_audit_log(user_id: str, action: str, entity_type: str = None,
                      entity_id: str = None, old_values: dict = None,
                      new_values: dict = None, ip_address: str = None,
                      user_agent: str = None):
-    import json
-    db.execute(
-        """INSERT INTO audit_log
-           (user_id, action, entity_type, entity_id, old_values, new_values, ip_address, user_agent)
-           VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
-        (user_id, action, entity_type, entity_id,
-         json.dumps(old_values) if old_values else None,
-         json.dumps(new_values) if new_values else None,
-         ip_address, user_agent)
-    )
+    # Values are serialized now so later changes to the dicts can't leak in
+    _audit_queue.put(_audit_row((user_id, action, entity_type, entity_id,
+                                 old_values, new_values, ip_address, user_agent)))
+    _ensure_audit_flusher()
+
+
+def create_audit_logs_bulk(entries: List[tuple]):
+    # Each entry: (user_id, action, entity_type, entity_id, old_values, new_values, ip_address, user_agent)
+    if entries:
+        _insert_audit_rows([_audit_row(entry) for entry in entries])
 
 
 # Admin user creation (for initial setup)
 def create_admin_user(username: str, email: str, password_hash: str) -> Optional[Dict[str, Any]]:
-    existing = get_user_by_username(username)
-    if existing:
-        # Update password hash if user exists (ensures password stays in sync with env var)
-        db.execute(
-            "UPDATE users SET password_hash = %s, email = %s WHERE id = %s",
-            (password_hash, email, existing['id'])
-        )
-        return get_user_by_id(existing['id'])
-
+    # Update password hash if user exists (ensures password stays in sync with env var).
+    # "inserted" is TRUE when the row was created rather than updated.
     return db.insert_returning(
         """INSERT INTO users (username, email, password_hash, is_active)
            VALUES (%s, %s, %s, TRUE)
-           RETURNING *""",
+           ON CONFLICT (username)
+           DO UPDATE SET password_hash = EXCLUDED.password_hash, email = EXCLUDED.email
+           RETURNING *, (xmax = 0) AS inserted""",
         (username, email, password_hash)
     )
 
 
 def get_dashboard_stats() -> Dict[str, Any]:
-    pages = db.fetch_one("SELECT COUNT(*) as count FROM pages")
-    published = db.fetch_one("SELECT COUNT(*) as count FROM pages WHERE is_published = TRUE")
-    submissions = get_submission_stats()
-
-    return {
-        'total_pages': pages['count'] if pages else 0,
-        'published_pages': published['count'] if published else 0,
-        'total_submissions': submissions['total'],
-        'unread_submissions': submissions['unread'],
-        'submissions_this_week': submissions['this_week']
-    }
+    return db.fetch_one(
+        """SELECT p.total_pages, p.published_pages,
+                  s.total_submissions, s.unread_submissions, s.submissions_this_week
+           FROM (SELECT COUNT(*) as total_pages,
+                        COUNT(*) FILTER (WHERE is_published = TRUE) as published_pages
+                 FROM pages) p
+           CROSS JOIN
+                (SELECT COUNT(*) as total_submissions,
+                        COUNT(*) FILTER (WHERE is_read = FALSE) as unread_submissions,
+                        COUNT(*) FILTER (WHERE created_at > CURRENT_DATE - INTERVAL '7 days') as submissions_this_week
+                 FROM contact_submissions) s"""
+    )
@@ -1,92 +1,73 @@
+import re
+import html
+import atexit
 import smtplib
 import logging
+import threading
+import time
+from string import Template
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
+
+from cachetools import TTLCache, cached
 
 from backend import database as db
 
 logger = logging.getLogger(__name__)
 
+# SMTP sessions are pooled per process and reused until they have sent
+# SMTP_MAX_MESSAGES. A reaper thread closes any left idle for SMTP_MAX_IDLE_SECONDS,
+# checking every SMTP_REAP_INTERVAL seconds.
+SMTP_MAX_MESSAGES = 100
+SMTP_MAX_IDLE_SECONDS = 100
+SMTP_REAP_INTERVAL = 30
+SMTP_TIMEOUT = 30
 
-def get_smtp_connection():
-    config = db.get_email_config()
+# A cached session is only reused while every setting it was opened with is unchanged
+SMTP_SESSION_FIELDS = ('smtp_host', 'smtp_port', 'use_tls', 'smtp_username', 'smtp_password')
 
-    if not config or not config.get('is_configured'):
-        return None, None
-
-    try:
-        if config.get('use_tls'):
-            server = smtplib.SMTP(config['smtp_host'], config['smtp_port'])
-            server.starttls()
-        else:
-            server = smtplib.SMTP_SSL(config['smtp_host'], config['smtp_port'])
-
-        if config.get('smtp_username') and config.get('smtp_password'):
-            server.login(config['smtp_username'], config['smtp_password'])
-
-        return server, config
-    except Exception as e:
-        logger.error(f"SMTP connection failed: {e}")
-        return None, None
+# Cheap sanity check so malformed recipients never reach the SMTP server
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
 
+# A session is either checked out by one thread (held in _smtp_local) or sitting in
+# _idle_sessions, so the reaper only ever touches sessions nobody is using
+_smtp_local = threading.local()
+_idle_sessions = []
+_open_servers = set()
+_smtp_lock = threading.Lock()
+_reaper_thread = None
 
-def send_email(to: str, subject: str, body_html: str, body_text: str = None) -> Tuple[bool, Optional[str]]:
-    server, config = get_smtp_connection()
+# Kept short because each gunicorn worker holds its own copy; saves from
+# the admin panel clear it immediately in the worker that handled them.
+_email_config_cache = TTLCache(maxsize=1, ttl=60)
+_email_config_lock = threading.RLock()
 
-    if not server:
-        return False, "Email not configured"
 
-    try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"{config.get('from_name', 'TEG Finance')} <{config['from_email']}>"
-        msg['To'] = to
+@cached(_email_config_cache, lock=_email_config_lock)
+def _cached_email_config():
+    return db.get_email_config()
 
-        # Plain text version
-        if body_text:
-            part1 = MIMEText(body_text, 'plain')
-            msg.attach(part1)
 
-        # HTML version
-        part2 = MIMEText(body_html, 'html')
-        msg.attach(part2)
+def invalidate_email_config_cache():
+    with _email_config_lock:
+        _email_config_cache.clear()
 
-        server.sendmail(config['from_email'], to, msg.as_string())
-        server.quit()
 
-        return True, None
-    except Exception as e:
-        logger.error(f"Failed to send email: {e}")
-        try:
-            server.quit()
-        except:
-            pass
-        return False, str(e)
-
-
-def send_contact_notification(submission: dict) -> Tuple[bool, Optional[str]]:
-    config = db.get_email_config()
-
-    if not config or not config.get('is_configured') or not config.get('recipient_email'):
-        logger.warning("Email not configured for contact notifications")
-        return False, "Email not configured"
-
-    subject = f"New Contact Form Submission: {submission.get('subject', 'No Subject')}"
-
-    body_html = f"""
+# Email bodies are parsed once at import; only the fields are substituted per send
+CONTACT_HTML = Template("""
     <!DOCTYPE html>
     <html>
     <head>
         <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: #16A085; color: white; padding: 20px; text-align: center; }}
-            .content {{ padding: 20px; background: #f9f9f9; }}
-            .field {{ margin-bottom: 15px; }}
-            .label {{ font-weight: bold; color: #16A085; }}
-            .value {{ margin-top: 5px; }}
-            .footer {{ padding: 20px; text-align: center; font-size: 12px; color: #666; }}
+            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+            .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+            .header { background: #16A085; color: white; padding: 20px; text-align: center; }
+            .content { padding: 20px; background: #f9f9f9; }
+            .field { margin-bottom: 15px; }
+            .label { font-weight: bold; color: #16A085; }
+            .value { margin-top: 5px; }
+            .footer { padding: 20px; text-align: center; font-size: 12px; color: #666; }
         </style>
     </head>
     <body>
@@ -97,27 +78,27 @@ def send_contact_notification(submission: dict) -> Tuple[bool, Optional[str]]:
             <div class="content">
                 <div class="field">
                     <div class="label">Name:</div>
-                    <div class="value">{submission.get('name', 'N/A')}</div>
+                    <div class="value">${name}</div>
                 </div>
                 <div class="field">
                     <div class="label">Email:</div>
-                    <div class="value">{submission.get('email', 'N/A')}</div>
+                    <div class="value">${email}</div>
                 </div>
                 <div class="field">
                     <div class="label">Phone:</div>
-                    <div class="value">{submission.get('phone', 'N/A') or 'Not provided'}</div>
+                    <div class="value">${phone}</div>
                 </div>
                 <div class="field">
                     <div class="label">Service Interest:</div>
-                    <div class="value">{submission.get('service_interest', 'N/A') or 'Not specified'}</div>
+                    <div class="value">${service_interest}</div>
                 </div>
                 <div class="field">
                     <div class="label">Subject:</div>
-                    <div class="value">{submission.get('subject', 'N/A') or 'No subject'}</div>
+                    <div class="value">${subject}</div>
                 </div>
                 <div class="field">
                     <div class="label">Message:</div>
-                    <div class="value">{submission.get('message', 'N/A')}</div>
+                    <div class="value">${message}</div>
                 </div>
             </div>
             <div class="footer">
@@ -126,45 +107,36 @@ def send_contact_notification(submission: dict) -> Tuple[bool, Optional[str]]:
         </div>
     </body>
     </html>
-    """
+    """)
 
-    body_text = f"""
+CONTACT_TEXT = Template("""
 New Contact Form Submission
 
-Name: {submission.get('name', 'N/A')}
-Email: {submission.get('email', 'N/A')}
-Phone: {submission.get('phone', 'N/A') or 'Not provided'}
-Service Interest: {submission.get('service_interest', 'N/A') or 'Not specified'}
-Subject: {submission.get('subject', 'N/A') or 'No subject'}
+Name: ${name}
+Email: ${email}
+Phone: ${phone}
+Service Interest: ${service_interest}
+Subject: ${subject}
 
 Message:
-{submission.get('message', 'N/A')}
+${message}
 
 ---
 This email was sent from your website contact form.
-    """
-
-    return send_email(config['recipient_email'], subject, body_html, body_text)
+    """)
 
-
-def send_password_reset_email(email: str, token: str) -> Tuple[bool, Optional[str]]:
-    # Note: In production, use HTTPS and proper domain
-    reset_url = f"http://localhost/admin/reset-password?token={token}"
-
-    subject = "Password Reset Request - TEG Finance Admin"
-
-    body_html = f"""
+RESET_HTML = Template("""
     <!DOCTYPE html>
     <html>
     <head>
         <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: #16A085; color: white; padding: 20px; text-align: center; }}
-            .content {{ padding: 30px; background: #f9f9f9; text-align: center; }}
-            .button {{ display: inline-block; padding: 15px 30px; background: #16A085; color: white; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
-            .footer {{ padding: 20px; text-align: center; font-size: 12px; color: #666; }}
-            .warning {{ color: #dc3545; font-size: 13px; }}
+            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+            .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+            .header { background: #16A085; color: white; padding: 20px; text-align: center; }
+            .content { padding: 30px; background: #f9f9f9; text-align: center; }
+            .button { display: inline-block; padding: 15px 30px; background: #16A085; color: white; text-decoration: none; border-radius: 5px; margin: 20px 0; }
+            .footer { padding: 20px; text-align: center; font-size: 12px; color: #666; }
+            .warning { color: #dc3545; font-size: 13px; }
         </style>
     </head>
     <body>
@@ -175,7 +147,7 @@ def send_password_reset_email(email: str, token: str) -> Tuple[bool, Optional[st
             <div class="content">
                 <p>You have requested to reset your password for the TEG Finance admin panel.</p>
                 <p>Click the button below to reset your password:</p>
-                <a href="{reset_url}" class="button">Reset Password</a>
+                <a href="${reset_url}" class="button">Reset Password</a>
                 <p class="warning">This link will expire in 1 hour.</p>
                 <p>If you did not request this password reset, please ignore this email.</p>
             </div>
@@ -185,15 +157,15 @@ def send_password_reset_email(email: str, token: str) -> Tuple[bool, Optional[st
         </div>
     </body>
     </html>
-    """
+    """)
 
-    body_text = f"""
+RESET_TEXT = Template("""
 Password Reset Request
 
 You have requested to reset your password for the TEG Finance admin panel.
 
 Click the link below to reset your password:
-{reset_url}
+${reset_url}
 
 This link will expire in 1 hour.
 
@@ -201,20 +173,9 @@ If you did not request this password reset, please ignore this email.
 
 ---
 TEG Finance Admin Panel
-    """
-
-    return send_email(email, subject, body_html, body_text)
-
-
-def send_test_email() -> Tuple[bool, Optional[str]]:
-    config = db.get_email_config()
+    """)
 
-    if not config or not config.get('recipient_email'):
-        return False, "Recipient email not configured"
-
-    subject = "Test Email - TEG Finance Admin"
-
-    body_html = """
+TEST_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -242,7 +203,7 @@ def send_test_email() -> Tuple[bool, Optional[str]]:
     </html>
     """
 
-    body_text = """
+TEST_TEXT = """
 Email Configuration Test
 
 Success!
@@ -251,4 +212,250 @@ Your email configuration is working correctly.
 Contact form submissions will be sent to this email address.
     """
 
+
+def _connect_smtp(config: dict):
+    if config.get('use_tls'):
+        server = smtplib.SMTP(config['smtp_host'], config['smtp_port'], timeout=SMTP_TIMEOUT)
+        server.starttls()
+        server.ehlo()
+    else:
+        server = smtplib.SMTP_SSL(config['smtp_host'], config['smtp_port'], timeout=SMTP_TIMEOUT)
+
+    if config.get('smtp_username') and config.get('smtp_password'):
+        server.login(config['smtp_username'], config['smtp_password'])
+
+    return server
+
+
+def _close_smtp(server):
+    with _smtp_lock:
+        _open_servers.discard(server)
+    try:
+        server.quit()
+    except Exception:
+        server.close()
+
+
+def _session_is_reusable(session: dict, key: tuple) -> bool:
+    if session['key'] != key:
+        return False
+    if time.monotonic() - session['last_used'] >= SMTP_MAX_IDLE_SECONDS:
+        return False
+    try:
+        return session['server'].noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def _reap_idle_sessions():
+    while True:
+        time.sleep(SMTP_REAP_INTERVAL)
+        cutoff = time.monotonic() - SMTP_MAX_IDLE_SECONDS
+        with _smtp_lock:
+            stale = [session for session in _idle_sessions if session['last_used'] < cutoff]
+            _idle_sessions[:] = [session for session in _idle_sessions if session['last_used'] >= cutoff]
+        for session in stale:
+            _close_smtp(session['server'])
+
+
+def _ensure_reaper():
+    # Started lazily so each Gunicorn worker runs its own thread after fork
+    global _reaper_thread
+    if _reaper_thread is None:
+        with _smtp_lock:
+            if _reaper_thread is None:
+                _reaper_thread = threading.Thread(target=_reap_idle_sessions, name='smtp-reaper', daemon=True)
+                _reaper_thread.start()
+
+
+def acquire_smtp():
+    config = _cached_email_config()
+
+    if not config or not config.get('is_configured'):
+        return None, None
+
+    key = tuple(config.get(field) for field in SMTP_SESSION_FIELDS)
+
+    # Most recently used first; anything stale or opened with other settings is closed
+    while True:
+        with _smtp_lock:
+            session = _idle_sessions.pop() if _idle_sessions else None
+        if session is None:
+            break
+        if _session_is_reusable(session, key):
+            _smtp_local.session = session
+            return session['server'], config
+        _close_smtp(session['server'])
+
+    try:
+        server = _connect_smtp(config)
+    except Exception as e:
+        logger.error(f"SMTP connection failed: {e}")
+        return None, None
+
+    with _smtp_lock:
+        _open_servers.add(server)
+    _smtp_local.session = {'server': server, 'key': key, 'sent': 0, 'used': False,
+                           'last_used': time.monotonic()}
+    _ensure_reaper()
+
+    return server, config
+
+
+def release_smtp(server, failed: bool = False) -> bool:
+    # Returns the session to the pool; the caller must not use server afterwards
+    session = getattr(_smtp_local, 'session', None)
+
+    if session and session['server'] is server:
+        _smtp_local.session = None
+        if not failed and session['sent'] < SMTP_MAX_MESSAGES:
+            session['last_used'] = time.monotonic()
+            with _smtp_lock:
+                _idle_sessions.append(session)
+            return True
+
+    _close_smtp(server)
+    return False
+
+
+@atexit.register
+def _close_all_smtp():
+    with _smtp_lock:
+        servers = list(_open_servers)
+        _idle_sessions.clear()
+    for server in servers:
+        try:
+            _close_smtp(server)
+        except Exception:
+            pass
+
+
+def is_valid_email(address: str) -> bool:
+    return bool(address) and _EMAIL_RE.match(address) is not None
+
+
+def _build_message(config: dict, to: str, subject: str, body_html: str, body_text: str = None):
+    # Without a plain text version the HTML part is sent on its own
+    if body_text:
+        msg = MIMEMultipart('alternative')
+        msg.attach(MIMEText(body_text, 'plain'))
+        msg.attach(MIMEText(body_html, 'html'))
+    else:
+        msg = MIMEText(body_html, 'html')
+
+    msg['Subject'] = subject
+    msg['From'] = f"{config.get('from_name', 'TEG Finance')} <{config['from_email']}>"
+    msg['To'] = to
+
+    return msg
+
+
+def send_emails_bulk(messages: List[Tuple[str, str, str, Optional[str]]]) -> List[Tuple[bool, Optional[str]]]:
+    # The session stays checked out for the whole batch and goes back to the pool at the end
+    results = []
+    server, config = None, None
+
+    try:
+        for to, subject, body_html, body_text in messages:
+            if not is_valid_email(to):
+                results.append((False, "Invalid recipient"))
+                continue
+
+            result = (False, "Email not configured")
+
+            # A dropped session is reconnected once and the message retried
+            for attempt in range(2):
+                if not server:
+                    server, config = acquire_smtp()
+                    if not server:
+                        break
+
+                session = _smtp_local.session
+                try:
+                    if session['used']:
+                        server.rset()
+                    session['used'] = True
+                    msg = _build_message(config, to, subject, body_html, body_text)
+                    server.send_message(msg, from_addr=config['from_email'], to_addrs=[to])
+                    session['sent'] += 1
+                    result = (True, None)
+                except smtplib.SMTPServerDisconnected as e:
+                    release_smtp(server, failed=True)
+                    server = None
+                    result = (False, str(e))
+                    continue
+                except Exception as e:
+                    result = (False, str(e))
+
+                # Retire the session once it has sent its quota
+                if session['sent'] >= SMTP_MAX_MESSAGES:
+                    release_smtp(server)
+                    server = None
+                break
+
+            if not result[0]:
+                logger.error(f"Failed to send email to {to}: {result[1]}")
+            results.append(result)
+    finally:
+        if server:
+            release_smtp(server)
+
+    return results
+
+
+def send_email(to: str, subject: str, body_html: str, body_text: str = None) -> Tuple[bool, Optional[str]]:
+    return send_emails_bulk([(to, subject, body_html, body_text)])[0]
+
+
+def _contact_fields(submission: dict) -> dict:
+    return {
+        'name': submission.get('name', 'N/A'),
+        'email': submission.get('email', 'N/A'),
+        'phone': submission.get('phone', 'N/A') or 'Not provided',
+        'service_interest': submission.get('service_interest', 'N/A') or 'Not specified',
+        'subject': submission.get('subject', 'N/A') or 'No subject',
+        'message': submission.get('message', 'N/A'),
+    }
+
+
+def send_contact_notification(submission: dict) -> Tuple[bool, Optional[str]]:
+    config = _cached_email_config()
+
+    if not config or not config.get('is_configured') or not config.get('recipient_email'):
+        logger.warning("Email not configured for contact notifications")
+        return False, "Email not configured"
+
+    subject = f"New Contact Form Submission: {submission.get('subject', 'No Subject')}"
+
+    # Submissions are stored as plain text, so they are escaped for the HTML body only
+    fields = _contact_fields(submission)
+    body_html = CONTACT_HTML.substitute({key: html.escape(str(value)) for key, value in fields.items()})
+    body_text = CONTACT_TEXT.substitute(fields)
+
     return send_email(config['recipient_email'], subject, body_html, body_text)
+
+
+def send_password_reset_email(email: str, token: str) -> Tuple[bool, Optional[str]]:
+    # Note: In production, use HTTPS and proper domain
+    reset_url = f"http://localhost/admin/reset-password?token={token}"
+
+    subject = "Password Reset Request - TEG Finance Admin"
+
+    body_html = RESET_HTML.substitute(reset_url=reset_url)
+    body_text = RESET_TEXT.substitute(reset_url=reset_url)
+
+    return send_email(email, subject, body_html, body_text)
+
+
+def send_test_email() -> Tuple[bool, Optional[str]]:
+    # The save may have been handled by another worker, so reload the config from the
+    # database; acquire_smtp below then connects with the same fresh settings
+    invalidate_email_config_cache()
+    config = _cached_email_config()
+
+    if not config or not config.get('recipient_email'):
+        return False, "Recipient email not configured"
+
+    subject = "Test Email - TEG Finance Admin"
+
+    return send_email(config['recipient_email'], subject, TEST_HTML, TEST_TEXT)
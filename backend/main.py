@@ -1,12 +1,34 @@
 import os
+import re
+import time
+import uuid
+import hashlib
+import atexit
 import logging
-from functools import wraps
-from flask import Flask, request, jsonify, render_template, redirect, url_for, make_response
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from io import BytesIO
+from flask import Flask, request, jsonify, render_template, redirect, url_for, make_response, g
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from flask_caching import Cache
+from werkzeug.middleware.proxy_fix import ProxyFix
+from bleach.sanitizer import Cleaner
+from PIL import Image
+from psycopg2.errors import UniqueViolation
+import orjson
 
 from backend.config import get_config
 from backend import database as db
+from backend.auth import (
+    get_current_user, authenticate_user, create_user_session, verify_totp,
+    generate_password_reset_token, hash_password, generate_totp_secret, get_totp_qr_code
+)
+from backend.email_service import (
+    send_contact_notification, send_password_reset_email, send_test_email,
+    is_valid_email, invalidate_email_config_cache
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,42 +42,222 @@ app = Flask(__name__,
 config = get_config()
 app.config.from_object(config)
 
-# Initialize rate limiter
+# nginx is the only proxy in front of the app; trust the one X-Forwarded-For entry it
+# appends so remote_addr is the real client rather than the proxy
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+
+# Initialize rate limiter; falls back to per-process counters if Redis is unreachable
 limiter = Limiter(
     key_func=get_remote_address,
     app=app,
-    default_limits=["100 per minute"],
-    storage_uri="memory://"
+    default_limits=[config.RATELIMIT_DEFAULT],
+    storage_uri=config.RATELIMIT_STORAGE_URI,
+    strategy="moving-window",
+    in_memory_fallback_enabled=True
 )
 
+# Rendered public pages are cached in Redis under a content version that every admin
+# write bumps. A worker that sees a newer version than its last request first drops its
+# local row caches, so it never refills the shared cache from stale navigation or pages.
+cache = Cache(app)
+CONTENT_VERSION_KEY = 'content_version'
+_content_version = {'seen': None}
+
+# Rows per page in the admin list views
+ADMIN_PAGE_SIZE = 50
+
+# Background pool for outgoing email so requests don't wait on SMTP
+email_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='email')
+atexit.register(email_executor.shutdown, wait=True)
+
 
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
 
+# Tags and attributes allowed in rich-text page content
+ALLOWED_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'br', 'strong', 'em',
+                          'u', 's', 'ul', 'ol', 'li', 'a', 'img', 'blockquote', 'pre', 'code'])
+ALLOWED_ATTRIBUTES = {'a': ['href', 'title', 'target'], 'img': ['src', 'alt', 'title']}
+
+# Cleaner instances are not thread-safe, so each worker thread builds its own once
+_cleaners = threading.local()
+
+
+def clean_html(value):
+    if not hasattr(_cleaners, 'html'):
+        _cleaners.html = Cleaner(tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+    return _cleaners.html.clean(value)
+
+
+# Admin plain fields (slugs, titles, labels, URLs, alt text, settings) never carry markup,
+# so angle brackets are dropped along with control characters; '&' and entities are kept
+_HTML_STRIP_RE = re.compile(r'[<>\x00-\x08\x0b\x0c\x0e-\x1f]')
+_CTRL_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def strip_html(value, max_length=None):
+    return _HTML_STRIP_RE.sub('', value[:max_length]) if value else value
+
+
+def clean_text(value, max_length=None):
+    # Free text (contact form fields, upload names) is stored as typed; templates
+    # autoescape it and the notification email escapes it for its HTML body
+    return _CTRL_RE.sub('', value[:max_length]) if value else value
+
+
 def get_client_ip():
-    if request.headers.get('X-Forwarded-For'):
-        return request.headers.get('X-Forwarded-For').split(',')[0].strip()
+    # ProxyFix has already resolved the client address from the proxy's header
     return request.remote_addr
 
 
+@app.before_request
+def load_client_info():
+    g.client_ip = get_client_ip()
+    g.user_agent = request.headers.get('User-Agent', '')[:500]
+
+
 def require_auth(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        from backend.auth import get_current_user
         user = get_current_user()
         if not user:
             if request.is_json or request.path.startswith('/api/'):
-                return jsonify({'error': 'Unauthorized'}), 401
+                return error_response('Unauthorized', 401)
             return redirect(url_for('admin_login'))
+        g.current_user = user
         return f(*args, **kwargs)
     return decorated
 
 
+def current_user():
+    # Reuse the user resolved by require_auth for the rest of the request
+    user = getattr(g, 'current_user', None)
+    if user is None:
+        user = get_current_user()
+    return user
+
+
+def _audit(user_id, action, entity_type=None, entity_id=None, **values):
+    # Every admin action is logged with the caller's IP and user agent
+    db.create_audit_log(user_id, action, entity_type, entity_id,
+                        ip_address=g.client_ip, user_agent=g.user_agent, **values)
+
+
+def _deliver_contact_email(submission_data, submission_id):
+    try:
+        email_sent, email_error = send_contact_notification(submission_data)
+        if submission_id:
+            db.update_submission_email_status(submission_id, email_sent, email_error)
+    except Exception as e:
+        logger.error(f"Contact notification error: {e}")
+
+
 def json_response(data, status=200):
-    response = jsonify(data)
+    # orjson handles datetimes and UUIDs natively; anything else falls back to str()
+    response = app.response_class(orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS),
+                                  status=status, mimetype='application/json')
     response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate'
-    return response, status
+    return response
+
+
+@lru_cache(maxsize=128)
+def _error_body(message: str) -> bytes:
+    return orjson.dumps({'error': message})
+
+
+def error_response(message, status):
+    # Error messages are constants, so their bodies are serialised once; the Response
+    # itself is built per call because after_request hooks and the limiter mutate headers
+    response = app.response_class(_error_body(message), status=status, mimetype='application/json')
+    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate'
+    return response
+
+
+def get_json_body():
+    # Non-JSON, empty, malformed and non-object bodies all come back as {} so handlers
+    # reject them as missing data. Requiring a JSON content type keeps cross-site
+    # text/plain form posts from reaching the cookie-authenticated admin endpoints.
+    if not request.is_json:
+        return {}
+    body = request.get_data(cache=False)
+    if not body:
+        return {}
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+# nginx serves /static as immutable, so asset URLs carry a hash of the file's contents
+# and change whenever the file does
+@lru_cache(maxsize=256)
+def _asset_hash(path, mtime):
+    with open(path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()[:12]
+
+
+@app.template_global()
+def asset_url(filename):
+    path = os.path.join(app.static_folder, filename)
+    try:
+        return f"/static/{filename}?v={_asset_hash(path, os.stat(path).st_mtime_ns)}"
+    except OSError:
+        return f"/static/{filename}"
+
+
+def public_cache(f):
+    # Let browsers and proxies reuse rendered public pages briefly
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+        if response.status_code == 200:
+            response.headers['Cache-Control'] = 'public, max-age=60'
+        return response
+    return decorated
+
+
+def _get_content_version():
+    try:
+        return cache.get(CONTENT_VERSION_KEY) or 0
+    except Exception as e:
+        logger.error(f"Content version lookup failed: {e}")
+        return None
+
+
+@app.before_request
+def sync_content_version():
+    if request.method not in ('GET', 'HEAD') or request.endpoint in ('static', 'health_check'):
+        return
+    version = _get_content_version()
+    if version is not None and version != _content_version['seen']:
+        db.invalidate_content_caches()
+        _content_version['seen'] = version
+    g.content_version = version
+
+
+def view_cache_key():
+    return f"view/{getattr(g, 'content_version', None)}{request.path}"
+
+
+def invalidate_public_pages():
+    # Orphans every cached view; the old entries simply expire. The Cache extension has
+    # no inc(), so the backend's atomic increment is used. Failures propagate: a write
+    # whose invalidation failed must not look like it succeeded.
+    cache.cache.inc(CONTENT_VERSION_KEY)
+
+
+def paginate(fetch, **kwargs):
+    # Fetch one extra row to tell whether a next page exists
+    page = max(request.args.get('page', 1, type=int), 1)
+    rows = fetch(limit=ADMIN_PAGE_SIZE + 1, offset=(page - 1) * ADMIN_PAGE_SIZE, **kwargs)
+    pagination = {
+        'page': page,
+        'has_prev': page > 1,
+        'has_next': len(rows) > ADMIN_PAGE_SIZE
+    }
+    return rows[:ADMIN_PAGE_SIZE], pagination
 
 
 def get_settings_context():
@@ -70,14 +272,27 @@ def get_navigation_context():
 # HEALTH CHECK
 # ============================================
 
+# Probes within HEALTH_CACHE_SECONDS of the last database check reuse its result
+HEALTH_CACHE_SECONDS = 2
+_health = {'checked_at': None, 'error': None}
+
+
 @app.route('/health')
+@limiter.exempt
 def health_check():
-    try:
-        db.db.fetch_one("SELECT 1")
-        return jsonify({'status': 'healthy', 'database': 'connected'})
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
+    now = time.monotonic()
+    if _health['checked_at'] is None or now - _health['checked_at'] >= HEALTH_CACHE_SECONDS:
+        try:
+            db.db.fetch_one("SELECT 1")
+            _health['error'] = None
+        except Exception as e:
+            logger.error(f"Health check failed: {e}")
+            _health['error'] = str(e)
+        _health['checked_at'] = now
+
+    if _health['error']:
+        return jsonify({'status': 'unhealthy', 'error': _health['error']}), 500
+    return jsonify({'status': 'healthy', 'database': 'connected'})
 
 
 # ============================================
@@ -85,6 +300,8 @@ def health_check():
 # ============================================
 
 @app.route('/')
+@public_cache
+@cache.cached(key_prefix=view_cache_key)
 def index():
     settings = get_settings_context()
     navigation = get_navigation_context()
@@ -97,6 +314,8 @@ def index():
 
 
 @app.route('/contact')
+@public_cache
+@cache.cached(key_prefix=view_cache_key)
 def contact():
     settings = get_settings_context()
     navigation = get_navigation_context()
@@ -109,9 +328,10 @@ def contact():
 
 
 @app.route('/services/<slug>')
+@public_cache
 def service_page(slug):
-    page = db.get_page_by_slug(slug)
-    if not page or not page['is_published']:
+    page = db.get_published_page_by_slug(slug)
+    if not page:
         return render_template('404.html'), 404
 
     settings = get_settings_context()
@@ -126,9 +346,10 @@ def service_page(slug):
 
 
 @app.route('/page/<slug>')
+@public_cache
 def cms_page(slug):
-    page = db.get_page_by_slug(slug)
-    if not page or not page['is_published']:
+    page = db.get_published_page_by_slug(slug)
+    if not page:
         return render_template('404.html'), 404
 
     settings = get_settings_context()
@@ -141,6 +362,8 @@ def cms_page(slug):
 
 
 @app.route('/about')
+@public_cache
+@cache.cached(key_prefix=view_cache_key)
 def about():
     settings = get_settings_context()
     navigation = get_navigation_context()
@@ -169,37 +392,36 @@ def api_public_settings():
 @app.route('/api/contact', methods=['POST'])
 @limiter.limit("3 per minute")
 def api_contact_submit():
-    data = request.get_json()
+    data = get_json_body()
 
     if not data:
-        return json_response({'error': 'Invalid request'}, 400)
+        return error_response('Invalid request', 400)
 
     # Validate required fields
     if not data.get('name') or not data.get('email') or not data.get('message'):
-        return json_response({'error': 'Name, email, and message are required'}, 400)
+        return error_response('Name, email, and message are required', 400)
+
+    if not is_valid_email(data['email'][:255]):
+        return error_response('Invalid email address', 400)
 
     # Sanitize input
-    import bleach
     submission_data = {
-        'name': bleach.clean(data['name'][:100]),
-        'email': bleach.clean(data['email'][:255]),
-        'phone': bleach.clean(data.get('phone', '')[:30]) if data.get('phone') else None,
-        'subject': bleach.clean(data.get('subject', '')[:255]) if data.get('subject') else None,
-        'message': bleach.clean(data['message'][:5000]),
-        'service_interest': bleach.clean(data.get('service_interest', '')[:100]) if data.get('service_interest') else None,
-        'ip_address': get_client_ip(),
-        'user_agent': request.headers.get('User-Agent', '')[:500]
+        'name': clean_text(data['name'], 100),
+        'email': clean_text(data['email'], 255),
+        'phone': clean_text(data['phone'], 30) if data.get('phone') else None,
+        'subject': clean_text(data['subject'], 255) if data.get('subject') else None,
+        'message': clean_text(data['message'], 5000),
+        'service_interest': clean_text(data['service_interest'], 100) if data.get('service_interest') else None,
+        'ip_address': g.client_ip,
+        'user_agent': g.user_agent
     }
 
     try:
         submission = db.create_contact_submission(submission_data)
 
-        # Try to send email notification
-        from backend.email_service import send_contact_notification
-        email_sent, email_error = send_contact_notification(submission_data)
-
-        if submission:
-            db.update_submission_email_status(submission['id'], email_sent, email_error)
+        # Send email notification in the background
+        email_executor.submit(_deliver_contact_email, submission_data,
+                              submission['id'] if submission else None)
 
         return json_response({
             'success': True,
@@ -207,7 +429,7 @@ def api_contact_submit():
         })
     except Exception as e:
         logger.error(f"Contact submission error: {e}")
-        return json_response({'error': 'Failed to submit message'}, 500)
+        return error_response('Failed to submit message', 500)
 
 
 # ============================================
@@ -217,8 +439,7 @@ def api_contact_submit():
 @app.route('/admin')
 @app.route('/admin/')
 def admin_index():
-    from backend.auth import get_current_user
-    user = get_current_user()
+    user = current_user()
     if user:
         return redirect(url_for('admin_dashboard'))
     return redirect(url_for('admin_login'))
@@ -226,8 +447,7 @@ def admin_index():
 
 @app.route('/admin/login')
 def admin_login():
-    from backend.auth import get_current_user
-    if get_current_user():
+    if current_user():
         return redirect(url_for('admin_dashboard'))
     return render_template('admin/login.html')
 
@@ -235,17 +455,15 @@ def admin_login():
 @app.route('/api/auth/login', methods=['POST'])
 @limiter.limit("5 per 15 minutes")
 def api_login():
-    from backend.auth import authenticate_user, create_user_session
-
-    data = request.get_json()
+    data = get_json_body()
     if not data or not data.get('username') or not data.get('password'):
-        return json_response({'error': 'Username and password required'}, 400)
+        return error_response('Username and password required', 400)
 
     result = authenticate_user(
         data['username'],
         data['password'],
-        get_client_ip(),
-        request.headers.get('User-Agent', '')
+        g.client_ip,
+        g.user_agent
     )
 
     if result.get('error'):
@@ -260,11 +478,11 @@ def api_login():
     # Create session
     session_token = create_user_session(
         result['user']['id'],
-        get_client_ip(),
-        request.headers.get('User-Agent', '')
+        g.client_ip,
+        g.user_agent
     )
 
-    response = make_response(json_response({'success': True, 'redirect': '/admin/dashboard'})[0])
+    response = json_response({'success': True, 'redirect': '/admin/dashboard'})
     response.set_cookie(
         config.SESSION_COOKIE_NAME,
         session_token,
@@ -274,12 +492,7 @@ def api_login():
         max_age=int(config.SESSION_LIFETIME.total_seconds())
     )
 
-    db.create_audit_log(
-        result['user']['id'],
-        'login',
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(result['user']['id'], 'login')
 
     return response
 
@@ -287,27 +500,25 @@ def api_login():
 @app.route('/api/auth/verify-2fa', methods=['POST'])
 @limiter.limit("5 per 15 minutes")
 def api_verify_2fa():
-    from backend.auth import verify_totp, create_user_session
-
-    data = request.get_json()
+    data = get_json_body()
     if not data or not data.get('user_id') or not data.get('code'):
-        return json_response({'error': 'User ID and code required'}, 400)
+        return error_response('User ID and code required', 400)
 
     user = db.get_user_by_id(data['user_id'])
     if not user or not user['totp_enabled']:
-        return json_response({'error': 'Invalid request'}, 400)
+        return error_response('Invalid request', 400)
 
     if not verify_totp(user['totp_secret'], data['code']):
-        return json_response({'error': 'Invalid verification code'}, 401)
+        return error_response('Invalid verification code', 401)
 
     # Create session
     session_token = create_user_session(
         user['id'],
-        get_client_ip(),
-        request.headers.get('User-Agent', '')
+        g.client_ip,
+        g.user_agent
     )
 
-    response = make_response(json_response({'success': True, 'redirect': '/admin/dashboard'})[0])
+    response = json_response({'success': True, 'redirect': '/admin/dashboard'})
     response.set_cookie(
         config.SESSION_COOKIE_NAME,
         session_token,
@@ -318,35 +529,23 @@ def api_verify_2fa():
     )
 
     db.reset_user_login_attempts(user['id'])
-    db.create_audit_log(
-        user['id'],
-        'login_2fa',
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['id'], 'login_2fa')
 
     return response
 
 
 @app.route('/api/auth/logout', methods=['POST'])
 def api_logout():
-    from backend.auth import get_current_user
-
     session_token = request.cookies.get(config.SESSION_COOKIE_NAME)
-    user = get_current_user()
+    user = current_user()
 
     if session_token:
         db.delete_session(session_token)
 
     if user:
-        db.create_audit_log(
-            user['user_id'],
-            'logout',
-            ip_address=get_client_ip(),
-            user_agent=request.headers.get('User-Agent', '')
-        )
+        _audit(user['user_id'], 'logout')
 
-    response = make_response(json_response({'success': True})[0])
+    response = json_response({'success': True})
     response.delete_cookie(config.SESSION_COOKIE_NAME)
     return response
 
@@ -354,14 +553,11 @@ def api_logout():
 @app.route('/api/auth/forgot-password', methods=['POST'])
 @limiter.limit("3 per hour")
 def api_forgot_password():
-    from backend.auth import generate_password_reset_token
-    from backend.email_service import send_password_reset_email
-
-    data = request.get_json()
+    data = get_json_body()
     email = data.get('email') if data else None
 
     if not email:
-        return json_response({'error': 'Email required'}, 400)
+        return error_response('Email required', 400)
 
     user = db.get_user_by_email(email)
 
@@ -378,32 +574,25 @@ def api_forgot_password():
 
 @app.route('/api/auth/reset-password', methods=['POST'])
 def api_reset_password():
-    from backend.auth import hash_password
-
-    data = request.get_json()
+    data = get_json_body()
     token = data.get('token')
     password = data.get('password')
 
     if not token or not password:
-        return json_response({'error': 'Token and password required'}, 400)
+        return error_response('Token and password required', 400)
 
     if len(password) < config.PASSWORD_MIN_LENGTH:
         return json_response({'error': f'Password must be at least {config.PASSWORD_MIN_LENGTH} characters'}, 400)
 
     user = db.get_user_by_reset_token(token)
     if not user:
-        return json_response({'error': 'Invalid or expired reset token'}, 400)
+        return error_response('Invalid or expired reset token', 400)
 
     password_hash = hash_password(password)
     db.update_user_password(user['id'], password_hash)
     db.delete_user_sessions(user['id'])
 
-    db.create_audit_log(
-        user['id'],
-        'password_reset',
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['id'], 'password_reset')
 
     return json_response({
         'success': True,
@@ -414,9 +603,7 @@ def api_reset_password():
 @app.route('/api/auth/setup-2fa', methods=['POST'])
 @require_auth
 def api_setup_2fa():
-    from backend.auth import get_current_user, generate_totp_secret, get_totp_qr_code
-
-    user = get_current_user()
+    user = current_user()
     secret = generate_totp_secret()
 
     # Store secret temporarily (not enabled yet)
@@ -433,31 +620,24 @@ def api_setup_2fa():
 @app.route('/api/auth/enable-2fa', methods=['POST'])
 @require_auth
 def api_enable_2fa():
-    from backend.auth import get_current_user, verify_totp
-
-    data = request.get_json()
+    data = get_json_body()
     code = data.get('code') if data else None
 
     if not code:
-        return json_response({'error': 'Verification code required'}, 400)
+        return error_response('Verification code required', 400)
 
-    user = get_current_user()
+    user = current_user()
     user_data = db.get_user_by_id(user['user_id'])
 
     if not user_data or not user_data['totp_secret']:
-        return json_response({'error': '2FA setup not initiated'}, 400)
+        return error_response('2FA setup not initiated', 400)
 
     if not verify_totp(user_data['totp_secret'], code):
-        return json_response({'error': 'Invalid verification code'}, 400)
+        return error_response('Invalid verification code', 400)
 
     db.update_user_totp(user['user_id'], user_data['totp_secret'], True)
 
-    db.create_audit_log(
-        user['user_id'],
-        '2fa_enabled',
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['user_id'], '2fa_enabled')
 
     return json_response({'success': True, 'message': '2FA has been enabled'})
 
@@ -465,17 +645,10 @@ def api_enable_2fa():
 @app.route('/api/auth/disable-2fa', methods=['POST'])
 @require_auth
 def api_disable_2fa():
-    from backend.auth import get_current_user
-
-    user = get_current_user()
+    user = current_user()
     db.update_user_totp(user['user_id'], None, False)
 
-    db.create_audit_log(
-        user['user_id'],
-        '2fa_disabled',
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['user_id'], '2fa_disabled')
 
     return json_response({'success': True, 'message': '2FA has been disabled'})
 
@@ -487,8 +660,7 @@ def api_disable_2fa():
 @app.route('/admin/dashboard')
 @require_auth
 def admin_dashboard():
-    from backend.auth import get_current_user
-    user = get_current_user()
+    user = current_user()
     stats = db.get_dashboard_stats()
 
     return render_template('admin/dashboard.html', user=user, stats=stats)
@@ -497,30 +669,26 @@ def admin_dashboard():
 @app.route('/admin/pages')
 @require_auth
 def admin_pages():
-    from backend.auth import get_current_user
-    user = get_current_user()
-    pages = db.get_all_pages()
+    user = current_user()
+    pages, pagination = paginate(db.get_all_pages)
 
-    return render_template('admin/pages.html', user=user, pages=pages)
+    return render_template('admin/pages.html', user=user, pages=pages, pagination=pagination)
 
 
 @app.route('/admin/pages/new')
 @app.route('/admin/pages/<page_id>')
 @require_auth
 def admin_page_editor(page_id=None):
-    from backend.auth import get_current_user
-    user = get_current_user()
+    user = current_user()
     page = db.get_page_by_id(page_id) if page_id else None
-    images = db.get_all_images()
 
-    return render_template('admin/page-editor.html', user=user, page=page, images=images)
+    return render_template('admin/page-editor.html', user=user, page=page)
 
 
 @app.route('/admin/navigation')
 @require_auth
 def admin_navigation():
-    from backend.auth import get_current_user
-    user = get_current_user()
+    user = current_user()
     items = db.get_navigation_items()
     pages = db.get_all_pages(published_only=True)
 
@@ -530,28 +698,25 @@ def admin_navigation():
 @app.route('/admin/images')
 @require_auth
 def admin_images():
-    from backend.auth import get_current_user
-    user = get_current_user()
-    images = db.get_all_images()
+    user = current_user()
+    images, pagination = paginate(db.get_all_images)
 
-    return render_template('admin/images.html', user=user, images=images)
+    return render_template('admin/images.html', user=user, images=images, pagination=pagination)
 
 
 @app.route('/admin/submissions')
 @require_auth
 def admin_submissions():
-    from backend.auth import get_current_user
-    user = get_current_user()
-    submissions = db.get_contact_submissions()
+    user = current_user()
+    submissions, pagination = paginate(db.get_contact_submissions)
 
-    return render_template('admin/submissions.html', user=user, submissions=submissions)
+    return render_template('admin/submissions.html', user=user, submissions=submissions, pagination=pagination)
 
 
 @app.route('/admin/settings')
 @require_auth
 def admin_settings():
-    from backend.auth import get_current_user
-    user = get_current_user()
+    user = current_user()
     settings = db.get_all_settings()
     user_data = db.get_user_by_id(user['user_id'])
 
@@ -561,8 +726,7 @@ def admin_settings():
 @app.route('/admin/email-config')
 @require_auth
 def admin_email_config():
-    from backend.auth import get_current_user
-    user = get_current_user()
+    user = current_user()
     email_config = db.get_email_config()
 
     return render_template('admin/email-config.html', user=user, email_config=email_config)
@@ -582,31 +746,19 @@ def api_admin_get_pages():
 @app.route('/api/admin/pages', methods=['POST'])
 @require_auth
 def api_admin_create_page():
-    from backend.auth import get_current_user
-    import bleach
-
-    user = get_current_user()
-    data = request.get_json()
+    user = current_user()
+    data = get_json_body()
 
     if not data or not data.get('title') or not data.get('slug'):
-        return json_response({'error': 'Title and slug are required'}, 400)
-
-    # Check for duplicate slug
-    existing = db.get_page_by_slug(data['slug'])
-    if existing:
-        return json_response({'error': 'A page with this URL already exists'}, 400)
+        return error_response('Title and slug are required', 400)
 
     # Sanitize HTML content (allow safe tags for rich text)
-    allowed_tags = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'br', 'strong', 'em',
-                    'u', 's', 'ul', 'ol', 'li', 'a', 'img', 'blockquote', 'pre', 'code']
-    allowed_attrs = {'a': ['href', 'title', 'target'], 'img': ['src', 'alt', 'title']}
-
     page_data = {
-        'slug': bleach.clean(data['slug']),
-        'title': bleach.clean(data['title']),
-        'meta_title': bleach.clean(data.get('meta_title', '')),
-        'meta_description': bleach.clean(data.get('meta_description', '')),
-        'content': bleach.clean(data.get('content', ''), tags=allowed_tags, attributes=allowed_attrs),
+        'slug': strip_html(data['slug']),
+        'title': strip_html(data['title']),
+        'meta_title': strip_html(data.get('meta_title', '')),
+        'meta_description': strip_html(data.get('meta_description', '')),
+        'content': clean_html(data.get('content', '')),
         'hero_image_id': data.get('hero_image_id'),
         'is_published': data.get('is_published', False),
         'is_service_page': data.get('is_service_page', False),
@@ -616,15 +768,17 @@ def api_admin_create_page():
     }
 
     page = db.create_page(page_data, user['user_id'])
+    if not page:
+        return error_response('A page with this URL already exists', 400)
+
+    invalidate_public_pages()
 
-    db.create_audit_log(
+    _audit(
         user['user_id'],
         'page_created',
         'page',
         page['id'],
-        new_values={'title': page['title'], 'slug': page['slug']},
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
+        new_values={'title': page['title'], 'slug': page['slug']}
     )
 
     return json_response({'success': True, 'page': page})
@@ -635,44 +789,27 @@ def api_admin_create_page():
 def api_admin_get_page(page_id):
     page = db.get_page_by_id(page_id)
     if not page:
-        return json_response({'error': 'Page not found'}, 404)
+        return error_response('Page not found', 404)
     return json_response({'page': page})
 
 
 @app.route('/api/admin/pages/<page_id>', methods=['PUT'])
 @require_auth
 def api_admin_update_page(page_id):
-    from backend.auth import get_current_user
-    import bleach
-
-    user = get_current_user()
-    data = request.get_json()
-
-    page = db.get_page_by_id(page_id)
-    if not page:
-        return json_response({'error': 'Page not found'}, 404)
-
-    # Check for duplicate slug (if changing)
-    if data.get('slug') and data['slug'] != page['slug']:
-        existing = db.get_page_by_slug(data['slug'])
-        if existing:
-            return json_response({'error': 'A page with this URL already exists'}, 400)
-
-    allowed_tags = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'br', 'strong', 'em',
-                    'u', 's', 'ul', 'ol', 'li', 'a', 'img', 'blockquote', 'pre', 'code']
-    allowed_attrs = {'a': ['href', 'title', 'target'], 'img': ['src', 'alt', 'title']}
+    user = current_user()
+    data = get_json_body()
 
     update_data = {}
     if 'slug' in data:
-        update_data['slug'] = bleach.clean(data['slug'])
+        update_data['slug'] = strip_html(data['slug'])
     if 'title' in data:
-        update_data['title'] = bleach.clean(data['title'])
+        update_data['title'] = strip_html(data['title'])
     if 'meta_title' in data:
-        update_data['meta_title'] = bleach.clean(data['meta_title'])
+        update_data['meta_title'] = strip_html(data['meta_title'])
     if 'meta_description' in data:
-        update_data['meta_description'] = bleach.clean(data['meta_description'])
+        update_data['meta_description'] = strip_html(data['meta_description'])
     if 'content' in data:
-        update_data['content'] = bleach.clean(data['content'], tags=allowed_tags, attributes=allowed_attrs)
+        update_data['content'] = clean_html(data['content'])
     if 'hero_image_id' in data:
         update_data['hero_image_id'] = data['hero_image_id']
     if 'is_published' in data:
@@ -686,44 +823,47 @@ def api_admin_update_page(page_id):
     if 'language' in data:
         update_data['language'] = data['language']
 
-    db.update_page(page_id, update_data, user['user_id'])
+    # Slug uniqueness is enforced by the database
+    try:
+        updated_page = db.update_page(page_id, update_data, user['user_id'])
+    except UniqueViolation:
+        return error_response('A page with this URL already exists', 400)
+
+    if not updated_page:
+        return error_response('Page not found', 404)
+
+    invalidate_public_pages()
+    old_title = updated_page.pop('old_title')
 
-    db.create_audit_log(
+    _audit(
         user['user_id'],
         'page_updated',
         'page',
         page_id,
-        old_values={'title': page['title']},
-        new_values=update_data,
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
+        old_values={'title': old_title},
+        new_values=update_data
     )
 
-    updated_page = db.get_page_by_id(page_id)
     return json_response({'success': True, 'page': updated_page})
 
 
 @app.route('/api/admin/pages/<page_id>', methods=['DELETE'])
 @require_auth
 def api_admin_delete_page(page_id):
-    from backend.auth import get_current_user
-
-    user = get_current_user()
-    page = db.get_page_by_id(page_id)
+    user = current_user()
+    page = db.delete_page(page_id)
 
     if not page:
-        return json_response({'error': 'Page not found'}, 404)
+        return error_response('Page not found', 404)
 
-    db.delete_page(page_id)
+    invalidate_public_pages()
 
-    db.create_audit_log(
+    _audit(
         user['user_id'],
         'page_deleted',
         'page',
         page_id,
-        old_values={'title': page['title'], 'slug': page['slug']},
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
+        old_values={'title': page['title'], 'slug': page['slug']}
     )
 
     return json_response({'success': True})
@@ -732,18 +872,15 @@ def api_admin_delete_page(page_id):
 @app.route('/api/admin/pages/<page_id>/publish', methods=['POST'])
 @require_auth
 def api_admin_toggle_publish(page_id):
-    from backend.auth import get_current_user
-
-    user = get_current_user()
-    page = db.get_page_by_id(page_id)
+    user = current_user()
+    page = db.toggle_page_publish(page_id, user['user_id'])
 
     if not page:
-        return json_response({'error': 'Page not found'}, 404)
+        return error_response('Page not found', 404)
 
-    new_status = not page['is_published']
-    db.update_page(page_id, {'is_published': new_status}, user['user_id'])
+    invalidate_public_pages()
 
-    return json_response({'success': True, 'is_published': new_status})
+    return json_response({'success': True, 'is_published': page['is_published']})
 
 
 # ============================================
@@ -760,18 +897,15 @@ def api_admin_get_navigation():
 @app.route('/api/admin/navigation', methods=['POST'])
 @require_auth
 def api_admin_create_navigation():
-    from backend.auth import get_current_user
-    import bleach
-
-    user = get_current_user()
-    data = request.get_json()
+    user = current_user()
+    data = get_json_body()
 
     if not data or not data.get('label'):
-        return json_response({'error': 'Label is required'}, 400)
+        return error_response('Label is required', 400)
 
     item_data = {
-        'label': bleach.clean(data['label']),
-        'url': bleach.clean(data.get('url', '')),
+        'label': strip_html(data['label']),
+        'url': strip_html(data.get('url', '')),
         'page_id': data.get('page_id'),
         'parent_id': data.get('parent_id'),
         'position': data.get('position', 0),
@@ -780,15 +914,14 @@ def api_admin_create_navigation():
     }
 
     item = db.create_navigation_item(item_data)
+    invalidate_public_pages()
 
-    db.create_audit_log(
+    _audit(
         user['user_id'],
         'navigation_created',
         'navigation',
         item['id'],
-        new_values={'label': item['label']},
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
+        new_values={'label': item['label']}
     )
 
     return json_response({'success': True, 'item': item})
@@ -797,17 +930,14 @@ def api_admin_create_navigation():
 @app.route('/api/admin/navigation/<item_id>', methods=['PUT'])
 @require_auth
 def api_admin_update_navigation(item_id):
-    from backend.auth import get_current_user
-    import bleach
-
-    user = get_current_user()
-    data = request.get_json()
+    user = current_user()
+    data = get_json_body()
 
     update_data = {}
     if 'label' in data:
-        update_data['label'] = bleach.clean(data['label'])
+        update_data['label'] = strip_html(data['label'])
     if 'url' in data:
-        update_data['url'] = bleach.clean(data['url'])
+        update_data['url'] = strip_html(data['url'])
     if 'page_id' in data:
         update_data['page_id'] = data['page_id']
     if 'parent_id' in data:
@@ -820,16 +950,9 @@ def api_admin_update_navigation(item_id):
         update_data['open_in_new_tab'] = data['open_in_new_tab']
 
     db.update_navigation_item(item_id, update_data)
+    invalidate_public_pages()
 
-    db.create_audit_log(
-        user['user_id'],
-        'navigation_updated',
-        'navigation',
-        item_id,
-        new_values=update_data,
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['user_id'], 'navigation_updated', 'navigation', item_id, new_values=update_data)
 
     return json_response({'success': True})
 
@@ -837,19 +960,11 @@ def api_admin_update_navigation(item_id):
 @app.route('/api/admin/navigation/<item_id>', methods=['DELETE'])
 @require_auth
 def api_admin_delete_navigation(item_id):
-    from backend.auth import get_current_user
-
-    user = get_current_user()
+    user = current_user()
     db.delete_navigation_item(item_id)
+    invalidate_public_pages()
 
-    db.create_audit_log(
-        user['user_id'],
-        'navigation_deleted',
-        'navigation',
-        item_id,
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['user_id'], 'navigation_deleted', 'navigation', item_id)
 
     return json_response({'success': True})
 
@@ -857,22 +972,16 @@ def api_admin_delete_navigation(item_id):
 @app.route('/api/admin/navigation/reorder', methods=['POST'])
 @require_auth
 def api_admin_reorder_navigation():
-    from backend.auth import get_current_user
-
-    user = get_current_user()
-    data = request.get_json()
+    user = current_user()
+    data = get_json_body()
 
     if not data or not data.get('items'):
-        return json_response({'error': 'Items are required'}, 400)
+        return error_response('Items are required', 400)
 
     db.reorder_navigation_items(data['items'])
+    invalidate_public_pages()
 
-    db.create_audit_log(
-        user['user_id'],
-        'navigation_reordered',
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['user_id'], 'navigation_reordered')
 
     return json_response({'success': True})
 
@@ -884,58 +993,58 @@ def api_admin_reorder_navigation():
 @app.route('/api/admin/images', methods=['GET'])
 @require_auth
 def api_admin_get_images():
-    images = db.get_all_images()
-    return json_response({'images': images})
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+
+    images = db.get_all_images(limit + 1, offset)
+    return json_response({'images': images[:limit], 'has_more': len(images) > limit})
 
 
 @app.route('/api/admin/images', methods=['POST'])
 @require_auth
 def api_admin_upload_image():
-    from backend.auth import get_current_user
-    from PIL import Image
-    import uuid
-    import os
-
-    user = get_current_user()
+    user = current_user()
 
     if 'file' not in request.files:
-        return json_response({'error': 'No file provided'}, 400)
+        return error_response('No file provided', 400)
 
     file = request.files['file']
     if not file.filename:
-        return json_response({'error': 'No file selected'}, 400)
+        return error_response('No file selected', 400)
 
     # Check file extension
     ext = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
     if ext not in config.ALLOWED_EXTENSIONS:
-        return json_response({'error': 'File type not allowed'}, 400)
+        return error_response('File type not allowed', 400)
 
     # Check MIME type
     if file.content_type not in config.ALLOWED_MIME_TYPES:
-        return json_response({'error': 'Invalid file type'}, 400)
+        return error_response('Invalid file type', 400)
 
     # Generate unique filename
     filename = f"{uuid.uuid4().hex}.{ext}"
     filepath = os.path.join(config.UPLOAD_FOLDER, filename)
 
-    # Save file
-    file.save(filepath)
-
-    # Get file size
-    file_size = os.path.getsize(filepath)
+    # Read the upload once; size and dimensions come from the in-memory copy
+    blob = file.stream.read()
+    file_size = len(blob)
 
-    # Get image dimensions
+    # Get image dimensions (Image.open only parses the header here)
     width, height = None, None
     try:
-        with Image.open(filepath) as img:
+        with Image.open(BytesIO(blob)) as img:
             width, height = img.size
     except Exception:
         pass
 
+    # Save file
+    with open(filepath, 'wb') as f:
+        f.write(blob)
+
     # Create database record
     image_data = {
         'filename': filename,
-        'original_filename': file.filename,
+        'original_filename': clean_text(file.filename, 255) or filename,
         'mime_type': file.content_type,
         'file_size': file_size,
         'width': width,
@@ -946,14 +1055,12 @@ def api_admin_upload_image():
 
     image = db.create_image(image_data)
 
-    db.create_audit_log(
+    _audit(
         user['user_id'],
         'image_uploaded',
         'image',
         image['id'],
-        new_values={'filename': filename},
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
+        new_values={'filename': filename}
     )
 
     return json_response({'success': True, 'image': image})
@@ -962,23 +1069,14 @@ def api_admin_upload_image():
 @app.route('/api/admin/images/<image_id>', methods=['PUT'])
 @require_auth
 def api_admin_update_image(image_id):
-    from backend.auth import get_current_user
-    import bleach
-
-    user = get_current_user()
-    data = request.get_json()
+    user = current_user()
+    data = get_json_body()
 
     if data and 'alt_text' in data:
-        db.update_image(image_id, {'alt_text': bleach.clean(data['alt_text'])})
+        db.update_image(image_id, {'alt_text': strip_html(data['alt_text'])})
+        invalidate_public_pages()
 
-    db.create_audit_log(
-        user['user_id'],
-        'image_updated',
-        'image',
-        image_id,
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['user_id'], 'image_updated', 'image', image_id)
 
     return json_response({'success': True})
 
@@ -986,31 +1084,29 @@ def api_admin_update_image(image_id):
 @app.route('/api/admin/images/<image_id>', methods=['DELETE'])
 @require_auth
 def api_admin_delete_image(image_id):
-    from backend.auth import get_current_user
-    import os
-
-    user = get_current_user()
+    user = current_user()
     image = db.get_image_by_id(image_id)
 
     if not image:
-        return json_response({'error': 'Image not found'}, 404)
+        return error_response('Image not found', 404)
 
     # Delete file
     filepath = os.path.join(config.UPLOAD_FOLDER, image['filename'])
-    if os.path.exists(filepath):
-        os.remove(filepath)
+    try:
+        os.unlink(filepath)
+    except FileNotFoundError:
+        pass
 
     # Delete database record
     db.delete_image(image_id)
+    invalidate_public_pages()
 
-    db.create_audit_log(
+    _audit(
         user['user_id'],
         'image_deleted',
         'image',
         image_id,
-        old_values={'filename': image['filename']},
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
+        old_values={'filename': image['filename']}
     )
 
     return json_response({'success': True})
@@ -1030,27 +1126,19 @@ def api_admin_get_settings():
 @app.route('/api/admin/settings', methods=['PUT'])
 @require_auth
 def api_admin_update_settings():
-    from backend.auth import get_current_user
-    import bleach
-
-    user = get_current_user()
-    data = request.get_json()
+    user = current_user()
+    data = get_json_body()
 
     if not data:
-        return json_response({'error': 'No settings provided'}, 400)
+        return error_response('No settings provided', 400)
 
     # Sanitize all values
-    sanitized = {key: bleach.clean(str(value)) for key, value in data.items()}
+    sanitized = {key: strip_html(str(value)) for key, value in data.items()}
 
     db.update_settings(sanitized, user['user_id'])
+    invalidate_public_pages()
 
-    db.create_audit_log(
-        user['user_id'],
-        'settings_updated',
-        new_values=list(sanitized.keys()),
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['user_id'], 'settings_updated', new_values=list(sanitized.keys()))
 
     return json_response({'success': True})
 
@@ -1072,13 +1160,11 @@ def api_admin_get_email_config():
 @app.route('/api/admin/email-config', methods=['POST'])
 @require_auth
 def api_admin_update_email_config():
-    from backend.auth import get_current_user
-
-    user = get_current_user()
-    data = request.get_json()
+    user = current_user()
+    data = get_json_body()
 
     if not data:
-        return json_response({'error': 'No configuration provided'}, 400)
+        return error_response('No configuration provided', 400)
 
     # Get existing config to preserve password if not changed
     existing = db.get_email_config()
@@ -1101,13 +1187,9 @@ def api_admin_update_email_config():
         config_data['smtp_password'] = existing.get('smtp_password')
 
     db.update_email_config(config_data, user['user_id'])
+    invalidate_email_config_cache()
 
-    db.create_audit_log(
-        user['user_id'],
-        'email_config_updated',
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['user_id'], 'email_config_updated')
 
     return json_response({'success': True})
 
@@ -1115,8 +1197,6 @@ def api_admin_update_email_config():
 @app.route('/api/admin/email-config/test', methods=['POST'])
 @require_auth
 def api_admin_test_email():
-    from backend.email_service import send_test_email
-
     success, error = send_test_email()
 
     if success:
@@ -1133,11 +1213,10 @@ def api_admin_test_email():
 @require_auth
 def api_admin_get_submissions():
     unread_only = request.args.get('unread', 'false').lower() == 'true'
-    limit = min(int(request.args.get('limit', 50)), 100)
-    offset = int(request.args.get('offset', 0))
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
 
-    submissions = db.get_contact_submissions(unread_only, limit, offset)
-    stats = db.get_submission_stats()
+    submissions, stats = db.get_contact_submissions_with_stats(unread_only, limit, offset)
 
     return json_response({'submissions': submissions, 'stats': stats})
 
@@ -1145,7 +1224,7 @@ def api_admin_get_submissions():
 @app.route('/api/admin/submissions/<submission_id>/read', methods=['PUT'])
 @require_auth
 def api_admin_mark_submission_read(submission_id):
-    data = request.get_json()
+    data = get_json_body()
     is_read = data.get('is_read', True) if data else True
 
     db.mark_submission_read(submission_id, is_read)
@@ -1155,19 +1234,10 @@ def api_admin_mark_submission_read(submission_id):
 @app.route('/api/admin/submissions/<submission_id>', methods=['DELETE'])
 @require_auth
 def api_admin_delete_submission(submission_id):
-    from backend.auth import get_current_user
-
-    user = get_current_user()
+    user = current_user()
     db.delete_contact_submission(submission_id)
 
-    db.create_audit_log(
-        user['user_id'],
-        'submission_deleted',
-        'submission',
-        submission_id,
-        ip_address=get_client_ip(),
-        user_agent=request.headers.get('User-Agent', '')
-    )
+    _audit(user['user_id'], 'submission_deleted', 'submission', submission_id)
 
     return json_response({'success': True})
 
@@ -1179,7 +1249,7 @@ def api_admin_delete_submission(submission_id):
 @app.errorhandler(404)
 def not_found(e):
     if request.path.startswith('/api/'):
-        return json_response({'error': 'Not found'}, 404)
+        return error_response('Not found', 404)
     return render_template('404.html'), 404
 
 
@@ -1187,13 +1257,13 @@ def not_found(e):
 def internal_error(e):
     logger.error(f"Internal error: {e}")
     if request.path.startswith('/api/'):
-        return json_response({'error': 'Internal server error'}, 500)
+        return error_response('Internal server error', 500)
     return render_template('500.html'), 500
 
 
 @app.errorhandler(429)
 def ratelimit_handler(e):
-    return json_response({'error': 'Too many requests. Please try again later.'}, 429)
+    return error_response('Too many requests. Please try again later.', 429)
 
 
 # ============================================
@@ -1202,32 +1272,26 @@ def ratelimit_handler(e):
 
 def init_admin_user():
     """Create or update admin user from environment variables"""
-    from backend.auth import hash_password
 
     try:
         password_hash = hash_password(config.ADMIN_PASSWORD)
-        existing = db.get_user_by_username(config.ADMIN_USERNAME)
 
-        db.create_admin_user(
+        user = db.create_admin_user(
             config.ADMIN_USERNAME,
             config.ADMIN_EMAIL,
             password_hash
         )
 
-        if existing:
-            logger.info(f"Updated admin user password: {config.ADMIN_USERNAME}")
-        else:
+        if user['inserted']:
             logger.info(f"Created initial admin user: {config.ADMIN_USERNAME}")
+        else:
+            logger.info(f"Updated admin user password: {config.ADMIN_USERNAME}")
     except Exception as e:
         logger.error(f"Failed to create/update admin user: {e}")
 
 
-# Initialize on first request
-@app.before_request
-def before_first_request():
-    if not hasattr(app, '_initialized'):
-        init_admin_user()
-        app._initialized = True
+# Runs once per worker at import instead of being checked on every request
+init_admin_user()
 
 
 if __name__ == '__main__':
@@ -6,6 +6,7 @@ Run this script to sync the admin user's password with ADMIN_PASSWORD env var.
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -24,8 +25,8 @@ def get_database_url():
 
 
 def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    salt = bcrypt.gensalt(rounds=12)
+    """Hash password using bcrypt (cost from BCRYPT_ROUNDS, default 12)"""
+    salt = bcrypt.gensalt(rounds=int(os.environ.get('BCRYPT_ROUNDS', 12)))
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 
@@ -56,17 +57,22 @@ def reset_admin_password():
 
     print(f"Resetting password for admin user: {admin_username}")
 
-    # Hash the password
-    password_hash = hash_password(admin_password)
-    print("Password hashed successfully")
+    # Hash the password in the background while the database connection is set up
+    executor = ThreadPoolExecutor(max_workers=1)
+    password_hash_future = executor.submit(hash_password, admin_password)
 
     # Connect to database
     conn_params = parse_database_url(database_url)
+    conn = None
+    cursor = None
 
     try:
         conn = psycopg2.connect(**conn_params)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
 
+        password_hash = password_hash_future.result()
+        print("Password hashed successfully")
+
         # Check if user exists
         cursor.execute(
             "SELECT id, username FROM users WHERE username = %s",
@@ -97,6 +103,7 @@ def reset_admin_password():
         print(f"ERROR: Database operation failed: {e}")
         sys.exit(1)
     finally:
+        executor.shutdown(wait=False)
         if cursor:
             cursor.close()
         if conn:
@@ -49,22 +49,73 @@ document.addEventListener('DOMContentLoaded', function() {
     const selectHeroBtn = document.getElementById('selectHeroBtn');
     const heroPreview = document.getElementById('heroPreview');
     const heroImageId = document.getElementById('heroImageId');
+    const imageGrid = document.getElementById('imageGrid');
+    const imageGridEmpty = document.getElementById('imageGridEmpty');
+    const imageGridMore = document.getElementById('imageGridMore');
+
+    // Images are fetched page by page the first time the picker opens
+    const IMAGE_PAGE_SIZE = 50;
+    let imagesLoaded = 0;
+    let imagesRequested = false;
 
     selectHeroBtn.addEventListener('click', function() {
         imagePickerModal.classList.add('show');
+        if (!imagesRequested) {
+            loadImages();
+        }
     });
 
-    document.querySelectorAll('.image-item').forEach(item => {
-        item.addEventListener('click', function() {
-            const id = this.dataset.id;
-            const filename = this.dataset.filename;
+    document.getElementById('loadMoreImages').addEventListener('click', loadImages);
+
+    imageGrid.addEventListener('click', function(e) {
+        const item = e.target.closest('.image-item');
+        if (!item) return;
 
-            heroImageId.value = id;
-            heroPreview.innerHTML = `<img src="/uploads/${filename}" alt="Hero image">`;
-            closeImagePicker();
-        });
+        const id = item.dataset.id;
+        const filename = item.dataset.filename;
+
+        heroImageId.value = id;
+        heroPreview.innerHTML = `<img src="/uploads/${filename}" alt="Hero image">`;
+        closeImagePicker();
     });
 
+    async function loadImages() {
+        imagesRequested = true;
+
+        try {
+            const response = await fetch(`/api/admin/images?limit=${IMAGE_PAGE_SIZE}&offset=${imagesLoaded}`);
+            const result = await response.json();
+
+            if (!response.ok) {
+                imagesRequested = imagesLoaded > 0;
+                showToast(result.error || 'Failed to load images', 'error');
+                return;
+            }
+
+            result.images.forEach(image => {
+                const item = document.createElement('div');
+                item.className = 'image-item';
+                item.dataset.id = image.id;
+                item.dataset.filename = image.filename;
+
+                const img = document.createElement('img');
+                img.src = `/uploads/${image.filename}`;
+                img.alt = image.alt_text || image.original_filename;
+                img.loading = 'lazy';
+
+                item.appendChild(img);
+                imageGrid.appendChild(item);
+            });
+
+            imagesLoaded += result.images.length;
+            imageGridEmpty.style.display = imagesLoaded ? 'none' : 'block';
+            imageGridMore.style.display = result.has_more ? 'block' : 'none';
+        } catch (error) {
+            imagesRequested = imagesLoaded > 0;
+            showToast('Network error', 'error');
+        }
+    }
+
     // Form submission
     form.addEventListener('submit', async function(e) {
         e.preventDefault();